@@ -2,8 +2,12 @@ from flask import Flask, render_template, request, redirect, url_for, Response,
 import os
 import time
 from werkzeug.utils import secure_filename
-from camera import VideoCamera, train_face, load_known_faces
-from utils import init_db, add_student, add_staff, get_student_by_reg, get_staff_by_email, get_attendance_stats, get_all_students, get_distinct_dates, get_available_months
+from camera import train_face, load_known_faces, add_face_samples, remove_face_samples
+from broadcast import get_broadcaster
+from camera_server import forward_face_samples, forward_face_removal
+from sample_store import add_new_samples, sample_store
+from camera_config import CAMERAS
+from utils import init_db, add_student, add_staff, get_student_by_reg, get_staff_by_email, get_attendance_stats, get_distinct_dates, get_available_months, get_attendance_summary, get_student_filter_options
 
 from datetime import datetime, date
 app = Flask(__name__)
@@ -31,7 +35,7 @@ except Exception as e:
 
 print("Loading Known Faces...")
 try:
-    load_known_faces()
+    load_known_faces(use_snapshot=True) # Reuse the saved model unless training images changed
     print("Faces Loaded.")
 except Exception as e:
     print(f"CRITICAL ERROR: Failed to load faces: {e}")
@@ -124,7 +128,9 @@ def register_student():
                     'EncodingPath': encoding_path # Points to the specific file, but camera.py will scan the dir
                 }
                 if add_student(data):
-                    load_known_faces() # Reload faces
+                    add_new_samples(reg_no, [encoding_path]) # Packed sample store, once migrated
+                    add_face_samples(reg_no, [encoding_path], student=data) # Append to live recognizer
+                    forward_face_samples(reg_no, [encoding_path], student=data) # ...and to camera processes
                     flash("Student Registered Successfully!")
                     return redirect(url_for('login'))
                 else:
@@ -171,7 +177,9 @@ def add_face_variant():
         variant_path = os.path.join(student_enc_dir, variant_name)
         
         if train_face(temp_path, variant_path):
-            load_known_faces()
+            add_new_samples(reg_no, [variant_path])
+            add_face_samples(reg_no, [variant_path])
+            forward_face_samples(reg_no, [variant_path])
             flash("New face appearance added successfully!")
         else:
             flash("Could not detect face. Please try a clear photo.")
@@ -235,39 +243,18 @@ def dashboard_staff():
     if 'user_id' not in session or session.get('user_type') != 'staff':
         return redirect(url_for('login'))
         
-    # Get all attendance records (or filter by date/dept if needed)
-    # For now, let's just show all students and their summary
-    students = get_all_students()
-    all_dates = get_distinct_dates()
-    total_working_days = len(all_dates)
-    
-    summary_data = []
+    # Per-student summary from one grouped query, optionally filtered by Dept/Year
+    selected_dept = request.args.get('dept') or None
+    selected_year = request.args.get('year') or None
     
-    for s in students:
-        s_stats = get_attendance_stats('student', s['RegisterNo'])
-        # Count days present (unique dates in stats)
-        present_days = {x['Date'] for x in s_stats if x['Status'] == 'Present'}
-        od_days = {x['Date'] for x in s_stats if x['Status'] == 'OD'}
-        present = len(present_days)
-        od = len(od_days)
-        
-        # Calculate percentage based on TOTAL working days
-        total_present = present + od
-        percentage = (total_present / total_working_days * 100) if total_working_days > 0 else 0
+    summary_data = get_attendance_summary(selected_dept, selected_year)
+    filter_options = get_student_filter_options()
         
-        summary_data.append({
-            'Name': s['Name'],
-            'RegisterNo': s['RegisterNo'],
-            'Dept': s['Dept'],
-            'Year': s['Year'],
-            'Total': total_working_days,
-            'Present': present,
-            'OD': od,
-            'Absent': total_working_days - total_present,
-            'Percentage': round(percentage, 2)
-        })
-        
-    return render_template('dashboard_staff.html', students=summary_data)
+    return render_template('dashboard_staff.html', students=summary_data,
+                           depts=filter_options['depts'],
+                           years=filter_options['years'],
+                           selected_dept=selected_dept,
+                           selected_year=selected_year)
 
 @app.route('/student_details/<reg_no>')
 def student_details(reg_no):
@@ -298,6 +285,37 @@ def student_details(reg_no):
                            selected_month=selected_month,
                            selected_status=selected_status)
 
+@app.route('/remove_face_samples/<reg_no>', methods=['POST'])
+def remove_face_samples_route(reg_no):
+    if 'user_id' not in session or session.get('user_type') != 'staff':
+        return redirect(url_for('login'))
+    
+    student = get_student_by_reg(reg_no)
+    if not student:
+        flash("Student not found")
+        return redirect(url_for('dashboard_staff'))
+        
+    try:
+        # Drop the samples everywhere a retrain reads them: the packed store and the JPEGs
+        if sample_store.exists():
+            sample_store.delete(reg_no=reg_no)
+        student_enc_dir = os.path.join(ENCODING_FOLDER, reg_no)
+        if os.path.isdir(student_enc_dir):
+            for file_name in os.listdir(student_enc_dir):
+                os.remove(os.path.join(student_enc_dir, file_name))
+        if student['EncodingPath'] and os.path.exists(student['EncodingPath']):
+            os.remove(student['EncodingPath'])
+            
+        if not remove_face_samples(reg_no):
+            load_known_faces() # Backend can't drop one student: retrain without them
+        forward_face_removal(reg_no)
+        flash(f"Face samples removed for {student['Name']}. They can add a new photo to be recognized again.")
+    except Exception as e:
+        print(f"Error removing face samples: {e}")
+        flash(f"Error: {e}")
+        
+    return redirect(url_for('student_details', reg_no=reg_no))
+
 @app.route('/api/student_attendance/<reg_no>')
 def get_student_attendance_api(reg_no):
     if 'user_id' not in session or session.get('user_type') != 'staff':
@@ -334,32 +352,41 @@ def get_student_attendance_api(reg_no):
         
     return jsonify(final_stats)
 
-def gen(camera):
+def gen(frames):
+    """Wraps a broadcaster subscription as a multipart MJPEG stream."""
     try:
-        while True:
-            frame = camera.get_frame()
-            if frame:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
-            else:
-                break
+        for frame in frames:
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
     except Exception as e:
         print(f"Camera Stream Error: {e}")
     finally:
-        # Check if camera has a release method and call it
-        # This ensures the hardware light turns off IMMEDIATELY when the client stops requesting frames.
-        if hasattr(camera, 'video'):
-             camera.video.release()
-        print("Camera Released.")
+        # Drop this viewer's reference. The last viewer to leave stops the shared worker,
+        # which turns the hardware light off IMMEDIATELY.
+        frames.close()
+        print("Viewer Disconnected.")
 
 @app.route('/video_feed')
-def video_feed():
-    return Response(gen(VideoCamera()),
+@app.route('/video_feed/<camera_id>')
+def video_feed(camera_id=None):
+    broadcaster = get_broadcaster(camera_id)
+    if broadcaster is None:
+        return "Unknown camera", 404
+    return Response(gen(broadcaster.subscribe()),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/api/camera_stats')
+def camera_stats_api():
+    if 'user_id' not in session or session.get('user_type') != 'staff':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify({str(c['id']): get_broadcaster(c['id']).stats() for c in CAMERAS})
+
 @app.route('/attendance')
 def attendance():
-    return render_template('attendance.html')
+    # ?camera=<id> picks one of camera_config.CAMERAS (default: the first)
+    camera_id = request.args.get('camera')
+    return render_template('attendance.html',
+                           feed_url=url_for('video_feed', camera_id=camera_id) if camera_id else url_for('video_feed'))
 
 @app.route('/logout')
 def logout():
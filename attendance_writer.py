@@ -0,0 +1,132 @@
+"""
+Write-behind queue for attendance marks.
+
+The camera loop enqueues recognition events and returns immediately; a
+background thread writes them to MySQL in batches (one connection, one
+commit per batch) with retry. The queue is bounded, so when the database
+falls behind submit() refuses new events instead of growing without limit.
+Whatever is still queued is flushed when the interpreter exits.
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+from utils import mark_attendance_batch
+
+# --- Writer Configuration ---
+WRITER_CONFIG = {
+    'batch_size': 20,         # Max events per database round trip
+    'flush_interval': 0.25,   # Seconds to wait for more events before flushing a partial batch
+    'max_queue': 500,         # Backpressure: submit() fails once this many events are waiting
+    'submit_timeout': 0.01,   # Seconds submit() may block on a full queue (keep the frame loop fast)
+    'max_retries': 3,         # Retries per batch while the database is unreachable, then the events fail
+    'retry_backoff': 0.5      # Seconds before the first retry; doubles on every attempt
+}
+
+class AttendanceWriter(object):
+    def __init__(self, config=None):
+        self.config = dict(WRITER_CONFIG, **(config or {}))
+        self.queue = queue.Queue(maxsize=self.config['max_queue'])
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.written = 0
+        self.failed = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Flushes whatever is queued and stops the worker thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def submit(self, reg_no, name, dept, year, callback=None):
+        """
+        Queues an attendance mark, timestamped now.
+        callback(success, message) runs on the writer thread once the batch is
+        committed or has exhausted its retries.
+        Returns False if the queue is full (the caller should try again later).
+        """
+        self.start()
+        now = datetime.now()
+        event = {
+            'RegisterNo': reg_no,
+            'Name': name,
+            'Dept': dept,
+            'Year': year,
+            'Date': now.strftime('%Y-%m-%d'),
+            'Time': now.strftime('%H:%M:%S')
+        }
+        try:
+            self.queue.put((event, callback), timeout=self.config['submit_timeout'])
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.config['flush_interval'])]
+            except queue.Empty:
+                continue
+
+            # Collect more events until the batch is full or the flush interval passes
+            deadline = time.monotonic() + self.config['flush_interval']
+            while len(batch) < self.config['batch_size']:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        events = [event for event, _ in batch]
+        attempt = 0
+        while True:
+            results = mark_attendance_batch(events)
+            if results is not None:
+                # Events the database rejected come back with no transition; retrying won't help
+                for (_, callback), (transition, msg) in zip(batch, results):
+                    if transition is None:
+                        self.failed += 1
+                    else:
+                        self.written += 1
+                    self._notify(callback, transition is not None, msg)
+                return
+
+            attempt += 1
+            if attempt > self.config['max_retries']:
+                print(f"Attendance writer: dropping {len(events)} events after {attempt} attempts")
+                self.failed += len(events)
+                for _, callback in batch:
+                    self._notify(callback, False, "Database Error")
+                return
+            time.sleep(self.config['retry_backoff'] * (2 ** (attempt - 1)))
+
+    def _notify(self, callback, success, msg):
+        if callback is None:
+            return
+        try:
+            callback(success, msg)
+        except Exception as e:
+            print(f"Attendance writer callback error: {e}")
+
+# Shared writer used by the camera pipeline
+attendance_writer = AttendanceWriter()
+# The worker is a daemon thread; flush queued marks instead of losing them on shutdown
+atexit.register(attendance_writer.stop)
@@ -0,0 +1,97 @@
+"""
+Benchmark Haar face detection at several detection scales.
+
+Grabs frames from a camera, video file or folder of images, runs
+camera.detect_faces at each scale and reports the time per frame and how
+many of the full-resolution detections each scale still finds. Use it to
+pick DETECTION_CONFIG values for each site's camera.
+
+Usage:
+    python benchmark_detection.py                              # camera_config.CAMERA_SOURCE
+    python benchmark_detection.py --source entrance.mp4 --frames 200
+    python benchmark_detection.py --source data/photos --scales 1.0 0.5 0.33
+"""
+import argparse
+import os
+import time
+
+import cv2
+
+from camera_config import CAMERA_SOURCE, DETECTION_CONFIG
+from camera import detect_faces
+from tracking import iou
+
+def load_frames(source, count):
+    """Returns up to `count` grayscale frames from a folder of images, video file or camera."""
+    if isinstance(source, str) and os.path.isdir(source):
+        frames = []
+        for file_name in sorted(os.listdir(source)):
+            if file_name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                img = cv2.imread(os.path.join(source, file_name), cv2.IMREAD_GRAYSCALE)
+                if img is not None:
+                    frames.append(img)
+            if len(frames) >= count:
+                break
+        return frames
+
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    video = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < count:
+        success, frame = video.read()
+        if not success:
+            break
+        frames.append(cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2GRAY))
+    video.release()
+    return frames
+
+def run(frames, config):
+    """Returns (seconds per frame, detections per frame)."""
+    detections = []
+    start = time.perf_counter()
+    for gray in frames:
+        detections.append(detect_faces(gray, config))
+    elapsed = (time.perf_counter() - start) / len(frames)
+    return elapsed, detections
+
+def recall(reference, detections):
+    """Fraction of reference boxes matched (IoU >= 0.5) by a detection in the same frame."""
+    total = found = 0
+    for ref_boxes, boxes in zip(reference, detections):
+        for ref in ref_boxes:
+            total += 1
+            if any(iou(ref, box) >= 0.5 for box in boxes):
+                found += 1
+    return found / total if total else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Haar detection scale benchmark")
+    parser.add_argument('--source', default=str(CAMERA_SOURCE), help="Camera index, video file/URL or image folder")
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5, 0.33])
+    parser.add_argument('--scale-factor', type=float, default=DETECTION_CONFIG['scale_factor'])
+    parser.add_argument('--min-neighbors', type=int, default=DETECTION_CONFIG['min_neighbors'])
+    parser.add_argument('--min-size', type=int, nargs=2, default=list(DETECTION_CONFIG['min_size']))
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        print(f"No frames could be read from {args.source}")
+        return
+    h, w = frames[0].shape[:2]
+    print(f"{len(frames)} frames at {w}x{h}, scale_factor={args.scale_factor}, "
+          f"min_neighbors={args.min_neighbors}, min_size={tuple(args.min_size)}")
+
+    base = {'scale_factor': args.scale_factor, 'min_neighbors': args.min_neighbors, 'min_size': tuple(args.min_size)}
+    _, reference = run(frames, dict(base, scale=1.0))
+
+    print(f"{'scale':>6} {'ms/frame':>9} {'fps':>7} {'faces/frame':>12} {'recall vs 1.0':>14}")
+    for scale in args.scales:
+        elapsed, detections = run(frames, dict(base, scale=scale))
+        faces_per_frame = sum(len(d) for d in detections) / len(frames)
+        print(f"{scale:>6.2f} {elapsed * 1000:>9.1f} {1.0 / elapsed:>7.1f} "
+              f"{faces_per_frame:>12.2f} {recall(reference, detections):>14.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Microbenchmark for the liveness landmark math.
+
+Compares the old per-landmark Python implementation of eye aspect ratio and
+head turn (one small np.array per landmark pair) with the path in camera.py (the 15
+landmarks liveness reads copied once per face into plain (x, y) tuples, then
+scalar math). A batched NumPy version was slower than both for 1-5 faces:
+per-call overhead outweighs the little arithmetic. Uses synthetic
+FaceMesh-shaped landmarks, so no camera or MediaPipe install is needed.
+
+Usage:
+    python benchmark_landmarks.py
+    python benchmark_landmarks.py --faces 5 --iterations 2000
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from camera import LEFT_EYE, RIGHT_EYE, landmark_points, eye_aspect_ratio, head_turn
+
+W, H = 1280, 720
+
+def legacy_ear(landmarks, indices, w, h):
+    def dist(i1, i2):
+        p1 = np.array([landmarks[i1].x * w, landmarks[i1].y * h])
+        p2 = np.array([landmarks[i2].x * w, landmarks[i2].y * h])
+        return np.linalg.norm(p1 - p2)
+
+    A = dist(indices[1], indices[5])
+    B = dist(indices[2], indices[4])
+    C = dist(indices[0], indices[3])
+    if C == 0: return 0
+    return (A + B) / (2.0 * C)
+
+def legacy_head_turn(landmarks, w, h):
+    nose_x, left_x, right_x = landmarks[1].x * w, landmarks[234].x * w, landmarks[454].x * w
+    total_width = right_x - left_x
+    if total_width == 0: return 0
+    return ((nose_x - left_x) / total_width - 0.5) * 2
+
+def legacy_frame(faces):
+    results = []
+    for lm in faces:
+        ear = (legacy_ear(lm, LEFT_EYE, W, H) + legacy_ear(lm, RIGHT_EYE, W, H)) / 2
+        results.append((ear, legacy_head_turn(lm, W, H)))
+    return results
+
+def compact_frame(faces):
+    results = []
+    for lm in faces:
+        points = landmark_points(lm, W, H)
+        results.append((eye_aspect_ratio(points), head_turn(points)))
+    return results
+
+def make_faces(count, num_landmarks=478, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        [SimpleNamespace(x=float(x), y=float(y), z=0.0) for x, y in rng.random((num_landmarks, 2))]
+        for _ in range(count)
+    ]
+
+def time_it(func, faces, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(faces)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Landmark EAR / head-turn microbenchmark")
+    parser.add_argument('--faces', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--iterations', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'faces':>5} {'legacy us/frame':>16} {'compact us/frame':>17} {'speedup':>8} {'max diff':>9}")
+    for count in args.faces:
+        faces = make_faces(count)
+        diff = max(
+            max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+            for a, b in zip(legacy_frame(faces), compact_frame(faces))
+        )
+        legacy = time_it(legacy_frame, faces, args.iterations)
+        compact = time_it(compact_frame, faces, args.iterations)
+        print(f"{count:>5} {legacy:>16.1f} {compact:>17.1f} {legacy / compact:>7.1f}x {diff:>9.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark the recognizer backends as the gallery grows.
+
+Trains each backend in recognizers.py on synthetic 200x200 face-sized images
+(blurred noise, a few noisy copies per "student") and reports training time
+and per-face latency at each gallery size, both one predict() per face and one
+predict_batch() for all probes (as a busy frame does). Use it to see where
+LBPH's one-by-one comparison starts to hurt and the gallery index pays off.
+
+Usage:
+    python benchmark_recognizer.py
+    python benchmark_recognizer.py --samples 500 2000 8000 --backends gallery
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from camera_config import RECOGNIZER_CONFIG
+from recognizers import BACKENDS, create_recognizer
+
+SAMPLES_PER_STUDENT = 4
+
+def make_faces(count, seed=0):
+    """`count` images, SAMPLES_PER_STUDENT noisy copies of each synthetic student."""
+    rng = np.random.default_rng(seed)
+    faces, labels = [], []
+    for label in range((count + SAMPLES_PER_STUDENT - 1) // SAMPLES_PER_STUDENT):
+        base = cv2.GaussianBlur(rng.integers(0, 256, (200, 200), dtype=np.uint8), (7, 7), 0)
+        for _ in range(SAMPLES_PER_STUDENT):
+            noise = rng.integers(-20, 21, base.shape)
+            faces.append(np.clip(base.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+            labels.append(label + 1)
+    return faces[:count], np.array(labels[:count])
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognizer backend benchmark")
+    parser.add_argument('--samples', type=int, nargs='+', default=[250, 1000, 4000])
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS))
+    parser.add_argument('--probes', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'backend':>8} {'samples':>8} {'train s':>8} {'predict ms/face':>16} {'batch ms/face':>14} {'top-1 acc':>10}")
+    for count in args.samples:
+        faces, labels = make_faces(count)
+        probes = list(range(0, count, max(1, count // args.probes)))[:args.probes]
+        for name in args.backends:
+            recognizer = create_recognizer(name, **RECOGNIZER_CONFIG.get(name, {}))
+            start = time.perf_counter()
+            recognizer.train(faces, labels)
+            train = time.perf_counter() - start
+
+            start = time.perf_counter()
+            hits = sum(recognizer.predict(faces[i])[0] == labels[i] for i in probes)
+            predict = (time.perf_counter() - start) / len(probes) * 1000
+
+            rois = np.stack([faces[i] for i in probes])
+            start = time.perf_counter()
+            recognizer.predict_batch(rois)
+            batch = (time.perf_counter() - start) / len(probes) * 1000
+            print(f"{name:>8} {count:>8} {train:>8.2f} {predict:>16.2f} {batch:>14.2f} {hits / len(probes):>10.0%}")
+
+if __name__ == "__main__":
+    main()
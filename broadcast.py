@@ -0,0 +1,142 @@
+"""
+Shares one camera pipeline between any number of /video_feed viewers.
+
+Each configured camera gets a single CameraBroadcaster. The first viewer starts
+a worker that runs the capture + recognition pipeline and publishes every
+annotated JPEG; further viewers just read the latest one. When the last
+viewer disconnects the worker stops and the device is released.
+"""
+import threading
+
+from camera import VideoCamera
+from camera_config import CAMERAS, CAMERA_PROCESSES, CAMERA_STARTUP_TIMEOUT
+from camera_server import CameraProcess
+
+class CameraBroadcaster(object):
+    def __init__(self, camera_factory, frame_timeout=10.0, startup_timeout=CAMERA_STARTUP_TIMEOUT):
+        self.camera_factory = camera_factory
+        self.frame_timeout = frame_timeout
+        self.startup_timeout = startup_timeout # Wait for a starting worker's first frame
+        self._started = False
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self._thread = None
+        self._stop = None
+        self._camera = None
+        self._frame = None
+        self._seq = 0
+        self._ended = False
+
+    def subscribe(self):
+        """Generator of JPEG frames for one viewer. Closing it releases the viewer's reference."""
+        last_seq = self._acquire()
+        try:
+            while True:
+                frame, last_seq = self._wait_frame(last_seq)
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self._release()
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def stats(self):
+        camera = self._camera
+        return {
+            'subscribers': self._subscribers,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'frames_published': self._seq,
+            'pipeline': camera.stats() if camera is not None else None
+        }
+
+    def _acquire(self):
+        """Adds a viewer. Returns the frame sequence number the viewer should start after."""
+        with self._cond:
+            self._subscribers += 1
+            if self._subscribers > 1:
+                return 0 # Worker already running: start from its latest frame
+            # Previous worker may still be shutting down; the new one waits for it
+            # so the two never hold the device at the same time.
+            previous = self._thread
+            self._stop = threading.Event()
+            self._ended = False
+            self._started = False
+            self._thread = threading.Thread(
+                target=self._run, args=(self._stop, previous), name='camera-broadcast', daemon=True
+            )
+            self._thread.start()
+            return self._seq # Skip the stale frame left by the previous worker
+
+    def _release(self):
+        with self._cond:
+            self._subscribers -= 1
+            if self._subscribers == 0 and self._stop is not None:
+                self._stop.set()
+                self._cond.notify_all()
+
+    def _wait_frame(self, last_seq):
+        with self._cond:
+            timeout = self.frame_timeout if self._started else self.startup_timeout
+            ready = self._cond.wait_for(lambda: self._seq != last_seq or self._ended, timeout)
+            if not ready or self._seq == last_seq:
+                return None, last_seq
+            return self._frame, self._seq
+
+    def _run(self, stop, previous):
+        if previous is not None:
+            previous.join()
+        if stop.is_set():
+            return
+
+        camera = self.camera_factory()
+        self._camera = camera
+        print("Camera Started.")
+        try:
+            while not stop.is_set():
+                frame = camera.get_frame(stop) # Returns None as soon as the last viewer leaves
+                if frame is None:
+                    break
+                with self._cond:
+                    self._frame = frame
+                    self._seq += 1
+                    self._started = True
+                    self._cond.notify_all()
+        except Exception as e:
+            print(f"Camera Stream Error: {e}")
+        finally:
+            camera.release()
+            self._camera = None
+            with self._cond:
+                if not stop.is_set():
+                    # Source failed while viewers were still watching - end their streams
+                    self._ended = True
+                    self._cond.notify_all()
+            print("Camera Released.")
+
+_broadcasters = {}
+_broadcasters_lock = threading.Lock()
+
+def get_camera_def(camera_id=None):
+    """Camera entry from camera_config.CAMERAS (the first one by default), or None."""
+    if camera_id is None:
+        return CAMERAS[0] if CAMERAS else None
+    return next((c for c in CAMERAS if str(c['id']) == str(camera_id)), None)
+
+def _camera_factory(camera_def):
+    if CAMERA_PROCESSES:
+        return lambda: CameraProcess(camera_def)
+    return lambda: VideoCamera(camera_def['source'], camera_def.get('detection'), camera_def.get('motion'),
+                               camera_def.get('shards'))
+
+def get_broadcaster(camera_id=None):
+    """Returns the shared broadcaster for a configured camera, or None if the id is unknown."""
+    camera_def = get_camera_def(camera_id)
+    if camera_def is None:
+        return None
+    with _broadcasters_lock:
+        if camera_def['id'] not in _broadcasters:
+            _broadcasters[camera_def['id']] = CameraBroadcaster(_camera_factory(camera_def))
+        return _broadcasters[camera_def['id']]
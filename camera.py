@@ -1,21 +1,55 @@
 import cv2
+import hashlib
+import json
+import math
+import multiprocessing
 import numpy as np
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Force CPU to avoid CUDA DLL errors
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
 
-from utils import mark_attendance, get_student_by_reg, get_all_students
-from camera_config import CAMERA_SOURCE
+from utils import get_all_students, get_students_by_class, student_directory
+from attendance_writer import attendance_writer
+from camera_config import (CAMERA_SOURCE, FACE_LOAD_WORKERS, DETECT_EVERY_N_FRAMES, TRACK_MIN_CONFIDENCE,
+                           IDENTITY_VOTE_CONFIG, ENCODING_DIR, FACE_SIZE,
+                           DETECTION_CONFIG, MOTION_GATE_CONFIG, FACE_LOCALIZER, MESH_BOX_MARGIN,
+                           LIVENESS_CROP_MARGIN, LIVENESS_STATE_CONFIG, RECOGNIZER_BACKEND, RECOGNIZER_CONFIG)
+from pipeline import FramePipeline
+from tracking import FaceTracker, Track
+from motion import MotionGate
+from liveness import LivenessStateStore
+from recognizers import create_recognizer
+from sample_store import sample_store
 
 # --- Liveness & Recognition Config ---
 face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-recognizer = cv2.face.LBPHFaceRecognizer_create()
+def new_recognizer():
+    """Empty recognizer of the configured backend (see recognizers.py)."""
+    return create_recognizer(RECOGNIZER_BACKEND, **RECOGNIZER_CONFIG.get(RECOGNIZER_BACKEND, {}))
+
+recognizer = new_recognizer()
+is_trained = False
+known_face_names = {} # Recognizer label id -> RegisterNo
+
+# Persisted model snapshot
+MODEL_DIR = 'data/model'
+MODEL_PATH = os.path.join(MODEL_DIR, recognizer.model_file) # One file name per backend
+MODEL_MANIFEST_PATH = os.path.join(MODEL_DIR, 'manifest.json')
+# Samples in the packed store (sample_store.py) are named 'store:<id>' where file paths are used
+STORE_SAMPLE_PREFIX = 'store:'
+
+# Guards recognizer / known_face_names / is_trained. get_frame predicts under it,
+# so a retrain or incremental update is never seen half-applied.
+model_lock = threading.RLock()
 
 # MediaPipe for Blink & Head Pose
 use_liveness = False
 face_mesh = None
+crop_face_mesh = None # Single-face instance for liveness crops in 'haar' mode
 mp = None # Global placeholder
 
 try:
@@ -30,6 +64,13 @@ try:
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
+        # Crops from different faces arrive back to back, so no frame-to-frame tracking here
+        crop_face_mesh = mp_face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5
+        )
         use_liveness = True
         print("Liveness Detection (MediaPipe) Initialized.")
     else:
@@ -64,99 +105,581 @@ STAGE_VERIFIED = 2
 
 # State Machine
 # Map: reg_no -> {'stage': 0, 'blink_detected': False, 'marked': False, 'last_seen': time, 'status_msg': ''}
-liveness_states = {}
+# 'marked' is set optimistically when the mark is queued; 'pending' stays True until the
+# background writer confirms it (on failure 'marked' is cleared so the next sighting retries).
+# Marked states last until the period (morning / evening) ends; unmarked ones expire out of view
+# and are capped in number (see LIVENESS_STATE_CONFIG).
+def new_liveness_state():
+    return {
+        'stage': STAGE_WAITING_BLINK, 
+        'marked': False,
+        'blink_time': 0
+    }
 
-def calculate_ear(landmarks, indices, w, h):
-    # Euclidean distance helper
-    def dist(i1, i2):
-        p1 = np.array([landmarks[i1].x * w, landmarks[i1].y * h])
-        p2 = np.array([landmarks[i2].x * w, landmarks[i2].y * h])
-        return np.linalg.norm(p1 - p2)
+liveness_states = LivenessStateStore(new_liveness_state, **LIVENESS_STATE_CONFIG)
 
-    A = dist(indices[1], indices[5])
-    B = dist(indices[2], indices[4])
-    C = dist(indices[0], indices[3])
+# Where queue_attendance sends marks: the in-process writer, or a relay to the
+# parent process when this camera runs in a worker process (see camera_server.py)
+attendance_sink = attendance_writer
 
-    if C == 0: return 0
-    return (A + B) / (2.0 * C)
+def set_attendance_sink(sink):
+    global attendance_sink
+    attendance_sink = sink
 
-def get_head_pose(landmarks, w, h):
-    # Simple estimation using nose tip (1) and average of ears or face sides (234, 454)
-    # 1: Nose tip, 234: Left ear/cheek, 454: Right ear/cheek
-    
-    nose = landmarks[1]
-    left_side = landmarks[234]
-    right_side = landmarks[454]
-    
-    # Calculate horizontal ratio
-    # If looking straight, dist(nose, left) ~= dist(nose, right)
-    # Ratio = dist(nose, left) / dist(left, right)
-    
-    nose_x = nose.x * w
-    left_x = left_side.x * w
-    right_x = right_side.x * w
-    
+def queue_attendance(state, reg_no, name, dept, year):
+    """Hands the mark to the background writer. Returns False if the writer queue is full."""
+    def on_written(success, msg):
+        state['pending'] = False
+        if success:
+            state['status_msg'] = msg
+        else:
+            state['marked'] = False
+
+    # Set before submit(): the writer thread may run on_written before submit() returns
+    state['marked'] = True
+    state['pending'] = True
+    if not attendance_sink.submit(reg_no, name, dept, year, callback=on_written):
+        state['marked'] = False
+        state['pending'] = False
+        return False
+    return True
+
+NOSE_TIP, LEFT_CHEEK, RIGHT_CHEEK = 1, 234, 454
+# FaceMesh face outline, used for the face box in 'mesh' mode
+FACE_OVAL = [10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288, 397, 365, 379, 378, 400, 377,
+             152, 148, 176, 149, 150, 136, 172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109]
+
+def _eye_points(eye):
+    # Top points of the eye's (1, 5), (2, 4) and (0, 3) pairs, then the matching bottom points
+    return [eye[1], eye[2], eye[0], eye[5], eye[4], eye[3]]
+
+# Only the landmarks that are read are copied out of the MediaPipe objects, in this order:
+# both eyes (6 points each), nose tip, left cheek, right cheek. 'mesh' mode also needs the
+# outline (from LIVENESS_POINTS onwards) for the face box.
+LIVENESS_LANDMARKS = _eye_points(LEFT_EYE) + _eye_points(RIGHT_EYE) + [NOSE_TIP, LEFT_CHEEK, RIGHT_CHEEK]
+NOSE_POINT, LEFT_CHEEK_POINT, RIGHT_CHEEK_POINT = 12, 13, 14
+LIVENESS_POINTS = 15
+MESH_LANDMARKS = LIVENESS_LANDMARKS + FACE_OVAL
+
+def landmark_points(landmarks, w, h, indices=LIVENESS_LANDMARKS, offset=(0, 0)):
+    """The FaceMesh landmarks in `indices` as a list of (x, y) pixel tuples, plus offset."""
+    ox, oy = offset
+    return [(landmarks[i].x * w + ox, landmarks[i].y * h + oy) for i in indices]
+
+def eye_aspect_ratio(points):
+    """EAR averaged over both eyes, from landmark_points(). 0 for a degenerate eye."""
+    total = 0.0
+    for eye in (0, 6):
+        A = math.dist(points[eye], points[eye + 3])
+        B = math.dist(points[eye + 1], points[eye + 4])
+        C = math.dist(points[eye + 2], points[eye + 5])
+        if C:
+            total += (A + B) / (2.0 * C)
+    return total / 2
+
+def head_turn(points):
+    """
+    Horizontal head turn: -1 (Left) to +1 (Right), 0 = straight.
+    Compares the nose tip x-position with the face sides (234, 454):
+    0.5 of the way across is center, < 0.4 is looking left (from camera view), > 0.6 right.
+    """
+    nose_x, left_x, right_x = points[NOSE_POINT][0], points[LEFT_CHEEK_POINT][0], points[RIGHT_CHEEK_POINT][0]
     total_width = right_x - left_x
-    if total_width == 0: return 0
+    if total_width == 0: return 0.0
+    # Normalize to -1 to 1 roughly, where 0 is center (0.2 -> -0.6)
+    return ((nose_x - left_x) / total_width - 0.5) * 2
+
+def run_face_mesh(frame):
+    """Runs FaceMesh on a BGR frame. Returns the MESH_LANDMARKS points of every face found."""
+    h, w = frame.shape[:2]
+    try:
+        result = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    except Exception:
+        return []
+    return [landmark_points(face.landmark, w, h, MESH_LANDMARKS) for face in (result.multi_face_landmarks or [])]
+
+def run_face_mesh_crop(frame, box, margin=LIVENESS_CROP_MARGIN):
+    """
+    Runs FaceMesh on one face's crop (box grown by margin on each side). Returns its
+    LIVENESS_LANDMARKS points in full-frame pixels, or None if no face was found.
+    """
+    h, w = frame.shape[:2]
+    x, y, bw, bh = box
+    mx, my = int(bw * margin), int(bh * margin)
+    x0, y0 = max(0, x - mx), max(0, y - my)
+    x1, y1 = min(w, x + bw + mx), min(h, y + bh + my)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    try:
+        result = crop_face_mesh.process(cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB))
+    except Exception:
+        return None
+    if not result.multi_face_landmarks:
+        return None
+    return landmark_points(result.multi_face_landmarks[0].landmark, x1 - x0, y1 - y0, offset=(x0, y0))
+
+def needs_liveness(state):
+    """True while a recognized face still has to blink or turn its head."""
+    return not state['marked'] and state['stage'] in (STAGE_WAITING_BLINK, STAGE_WAITING_HEAD_TURN)
+
+def mesh_box(points, w, h, margin=MESH_BOX_MARGIN):
+    """Square (x, y, w, h) box around a face's outline landmarks, padded by margin and clipped to the frame."""
+    outline = np.array(points[LIVENESS_POINTS:])
+    (min_x, min_y), (max_x, max_y) = outline.min(axis=0), outline.max(axis=0)
+    side = max(max_x - min_x, max_y - min_y) * (1 + margin)
+    cx, cy = (max_x + min_x) / 2, (max_y + min_y) / 2
+    x, y = int(max(0, cx - side / 2)), int(max(0, cy - side / 2))
+    return (x, y, int(min(w - x, side)), int(min(h - y, side)))
+
+def pair_meshes(faces, meshes, w, h):
+    """
+    Gives each face (Track) its own mesh: the one whose nose tip (landmark 1) falls
+    inside the face box, nearest the box centre. Faces without one get None.
+    """
+    free = list(meshes)
+    for track in faces:
+        x, y, bw, bh = track.box
+        best, best_dist = None, None
+        for lm in free:
+            nx, ny = lm[NOSE_POINT]
+            if x <= nx <= x + bw and y <= ny <= y + bh:
+                dist = (nx - (x + bw / 2)) ** 2 + (ny - (y + bh / 2)) ** 2
+                if best is None or dist < best_dist:
+                    best, best_dist = lm, dist
+        track.landmarks = best
+        if best is not None:
+            free = [lm for lm in free if lm is not best]
+
+def collect_sample_paths(students):
+    """
+    Returns [(reg_no, [image paths])] in student order: the student's samples in
+    the packed store (as 'store:<id>') plus every image in their data/encodings/<RegisterNo>/
+    folder that never made it into the store, or their EncodingPath if there are none.
+    """
+    store_ids = sample_store.ids_by_reg() if sample_store.exists() else {}
+    store_sources = sample_store.sources() if sample_store.exists() else set()
+    sample_paths = []
+    for student in students:
+        reg_no = str(student['RegisterNo'])
+        student_dir = os.path.join(ENCODING_DIR, reg_no)
+        paths = [f"{STORE_SAMPLE_PREFIX}{sample_id}" for sample_id in store_ids.get(reg_no, [])]
+        
+        if os.path.isdir(student_dir):
+            for file_name in sorted(os.listdir(student_dir)):
+                path = os.path.join(student_dir, file_name)
+                # Files already imported (or deleted) in the store are skipped; the rest were
+                # saved while the store append failed, so they are read from disk instead
+                if file_name.lower().endswith(('.jpg', '.jpeg', '.png')) and os.path.normpath(path) not in store_sources:
+                    paths.append(path)
+        
+        if not paths:
+            photo_path = student['EncodingPath']
+            if photo_path and os.path.exists(photo_path):
+                paths.append(photo_path)
+                
+        sample_paths.append((reg_no, paths))
+    return sample_paths
+
+def decode_sample(img_path):
+    """Reads one face crop as a FACE_SIZE grayscale image, or None if unreadable."""
+    if img_path.startswith(STORE_SAMPLE_PREFIX):
+        img = sample_store.get(img_path[len(STORE_SAMPLE_PREFIX):]) # Already decoded, straight from the memmap
+    else:
+        img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    return cv2.resize(img, FACE_SIZE)
+
+def decode_samples(paths, workers=None):
+    """
+    Decodes face crops across a thread pool (cv2.imread/resize release the GIL).
+    Results are returned in the same order as paths, so label order stays deterministic.
+    """
+    workers = FACE_LOAD_WORKERS if workers is None else workers
+    if workers <= 1 or len(paths) < 2:
+        return [decode_sample(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(decode_sample, paths))
+
+def _file_hash(path):
+    if path.startswith(STORE_SAMPLE_PREFIX):
+        return path # Store samples never change; a deleted one disappears from the manifest
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def build_manifest(sample_paths, workers=None):
+    """Content hashes of every training image: {reg_no: {path: sha1}}."""
+    workers = FACE_LOAD_WORKERS if workers is None else workers
+    all_paths = [path for _, paths in sample_paths for path in paths]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        digests = dict(zip(all_paths, pool.map(_file_hash, all_paths)))
+    return {reg_no: {path: digests[path] for path in paths} for reg_no, paths in sample_paths}
+
+def save_model_snapshot(model, face_names, manifest):
+    """
+    Writes the trained model plus its label map and manifest to MODEL_DIR. Only the web
+    process saves: camera processes train the same model and would race it on the files.
+    """
+    if multiprocessing.parent_process() is not None:
+        return
+    try:
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        # Same extension as MODEL_PATH (LBPH picks the format from it), swapped in whole
+        tmp_model = os.path.join(MODEL_DIR, 'tmp-' + os.path.basename(MODEL_PATH))
+        model.write(tmp_model)
+        os.replace(tmp_model, MODEL_PATH)
+        tmp_path = MODEL_MANIFEST_PATH + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'backend': RECOGNIZER_BACKEND,
+                'labels': {str(label): reg_no for label, reg_no in face_names.items()},
+                'manifest': manifest
+            }, f)
+        os.replace(tmp_path, MODEL_MANIFEST_PATH) # Manifest last: it only ever describes a complete model
+    except Exception as e:
+        print(f"Error saving model snapshot: {e}")
+
+def read_model_snapshot():
+    """Returns (face_names, manifest) from the last snapshot, or None."""
+    if not (os.path.exists(MODEL_PATH) and os.path.exists(MODEL_MANIFEST_PATH)):
+        return None
+    try:
+        with open(MODEL_MANIFEST_PATH) as f:
+            data = json.load(f)
+        if data.get('backend', 'lbph') != RECOGNIZER_BACKEND:
+            print("Saved model is from another recognizer backend - retraining.")
+            return None
+        face_names = {int(label): reg_no for label, reg_no in data['labels'].items()}
+        return face_names, data['manifest']
+    except Exception as e:
+        print(f"Error reading model snapshot: {e}")
+        return None
+
+def _install_model(model, face_names, trained, students):
+    global recognizer, is_trained, known_face_names
+    with model_lock:
+        recognizer = model
+        known_face_names = face_names
+        is_trained = trained
+        # Refresh the profile cache used by get_frame (keyed by the same label ids)
+        student_directory.load(students, known_face_names)
+
+def _load_from_snapshot(students, sample_paths, manifest, snapshot):
+    """
+    Restores the saved model if no training image changed or disappeared since
+    it was written. Images added since then are applied with update().
+    Returns False when a full retrain is needed.
+    """
+    face_names, old_manifest = snapshot
+    for reg_no, files in old_manifest.items():
+        current = manifest.get(reg_no)
+        if current is None or any(current.get(path) != digest for path, digest in files.items()):
+            print("Training images changed since the saved model - retraining.")
+            return False
+            
+    model = new_recognizer()
+    try:
+        model.read(MODEL_PATH)
+    except Exception as e:
+        print(f"Saved model could not be read ({e}) - retraining.")
+        return False
     
-    # 0.5 is center. < 0.4 is looking left (from camera view), > 0.6 is looking right.
-    ratio = (nose_x - left_x) / total_width
+    label_of = {reg_no: label for label, reg_no in face_names.items()}
+    next_id = max(face_names, default=0)
+    trained = len(old_manifest) > 0 and any(old_manifest.values())
+    added = 0
     
-    # Normalize to -1 to 1 roughly, where 0 is center
-    # strict 0.5 -> 0
-    # 0.2 -> -0.3 (-30%)
-    turn_val = (ratio - 0.5) * 2 
-    return turn_val # -1 (Left) to +1 (Right)
+    for reg_no, paths in sample_paths:
+        if reg_no not in label_of:
+            next_id += 1
+            label_of[reg_no] = next_id
+            face_names[next_id] = reg_no
+        known = old_manifest.get(reg_no, {})
+        new_faces = decode_samples([path for path in paths if path not in known])
+        new_faces = [face for face in new_faces if face is not None]
+        if new_faces:
+            labels = np.array([label_of[reg_no]] * len(new_faces))
+            if trained:
+                model.update(new_faces, labels)
+            else:
+                model.train(new_faces, labels)
+                trained = True
+            added += len(new_faces)
+            
+    if added:
+        save_model_snapshot(model, face_names, manifest)
+    _install_model(model, face_names, trained, students)
+    print(f"Loaded saved model ({added} new face samples applied).")
+    return True
 
-def load_known_faces():
-    global is_trained, known_face_names
+def load_known_faces(use_snapshot=False):
+    """
+    Full retrain from every student's samples. The new model is built off to the
+    side and swapped in under model_lock, so recognition keeps running meanwhile.
+    Existing label ids are kept, so labels stay stable across retrains.
+    With use_snapshot=True (app startup) the model saved in MODEL_DIR is reused
+    unless the manifest shows the training images changed.
+    """
     print("Loading known faces...")
     faces, ids = [], []
-    known_face_names = {}
+    timings = {}
     
     try:
+        start = time.perf_counter()
         students = get_all_students()
-        current_id = 0
-        BASE_ENCODING_DIR = 'data/encodings' 
+        sample_store.reload() # Pick up samples added or compacted since this process last looked
+        sample_paths = collect_sample_paths(students)
+        timings['list'] = time.perf_counter() - start
         
-        for student in students:
-            reg_no = str(student['RegisterNo'])
-            current_id += 1 
-            known_face_names[current_id] = reg_no
+        start = time.perf_counter()
+        manifest = build_manifest(sample_paths)
+        timings['hash'] = time.perf_counter() - start
+        
+        snapshot = read_model_snapshot()
+        if use_snapshot and snapshot and _load_from_snapshot(students, sample_paths, manifest, snapshot):
+            return
+        
+        # Keep label ids from the running model (or the last snapshot) stable
+        face_names = known_face_names or (snapshot[0] if snapshot else {})
+        label_of = {reg_no: label for label, reg_no in face_names.items()}
+        next_id = max(face_names, default=0)
+        new_face_names = {}
+        
+        # Flatten to (label, path) in student order, then decode in parallel
+        labelled_paths = []
+        for reg_no, paths in sample_paths:
+            current_id = label_of.get(reg_no)
+            if current_id is None:
+                next_id += 1
+                current_id = next_id
+            new_face_names[current_id] = reg_no
+            labelled_paths.extend((current_id, path) for path in paths)
             
-            student_dir = os.path.join(BASE_ENCODING_DIR, reg_no)
-            loaded_count = 0
+        start = time.perf_counter()
+        decoded = decode_samples([path for _, path in labelled_paths])
+        for (current_id, _), face in zip(labelled_paths, decoded):
+            if face is not None:
+                faces.append(face)
+                ids.append(current_id)
+        timings['decode'] = time.perf_counter() - start
+                        
+        start = time.perf_counter()
+        model = new_recognizer()
+        if len(faces) > 0:
+            model.train(faces, np.array(ids))
+        timings['train'] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        if len(faces) > 0:
+            save_model_snapshot(model, new_face_names, manifest)
+        timings['save'] = time.perf_counter() - start
             
-            if os.path.exists(student_dir) and os.path.isdir(student_dir):
-                for file_name in os.listdir(student_dir):
-                    if file_name.lower().endswith(('.jpg', '.jpeg', '.png')):
-                        img_path = os.path.join(student_dir, file_name)
-                        img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-                        if img is not None:
-                            faces.append(cv2.resize(img, (200, 200)))
-                            ids.append(current_id)
-                            loaded_count += 1
+        _install_model(model, new_face_names, len(faces) > 0, students)
+        clear_shards() # Rebuilt from the new samples on next use
             
-            if loaded_count == 0:
-                photo_path = student['EncodingPath']
-                if photo_path and os.path.exists(photo_path):
-                    img = cv2.imread(photo_path, cv2.IMREAD_GRAYSCALE)
-                    if img is not None:
-                        faces.append(cv2.resize(img, (200, 200)))
-                        ids.append(current_id)
-                        loaded_count += 1
-                        
         if len(faces) > 0:
-            recognizer.train(faces, np.array(ids))
-            is_trained = True
             print(f"Trained on {len(faces)} faces from {len(students)} students.")
         else:
-            is_trained = False
             print("No faces found to train.")
+        print("Face load timings: " + ", ".join(f"{phase} {secs:.2f}s" for phase, secs in timings.items())
+              + f" ({FACE_LOAD_WORKERS} workers)")
             
     except Exception as e:
         print(f"Error loading faces: {e}")
 
+def add_face_samples(reg_no, image_paths, student=None):
+    """
+    Incremental alternative to load_known_faces() for a single student: appends the
+    new samples to the live recognizer with update() instead of retraining
+    everyone. New students get the next free label id.
+    Returns True if at least one sample was added.
+    """
+    global is_trained, known_face_names
+    reg_no = str(reg_no)
+    
+    # Decode outside the lock - only the model update itself blocks recognition.
+    # The saved snapshot is not rewritten here; the next startup applies these
+    # new images to it as a delta (see _load_from_snapshot).
+    samples = [decode_sample(img_path) for img_path in image_paths]
+    samples = [face for face in samples if face is not None]
+    if not samples:
+        return False
+        
+    try:
+        with model_lock:
+            label = next((l for l, r in known_face_names.items() if r == reg_no), None)
+            if label is None:
+                label = max(known_face_names, default=0) + 1
+                
+            labels = np.array([label] * len(samples))
+            if is_trained:
+                recognizer.update(samples, labels)
+            else:
+                recognizer.train(samples, labels)
+                is_trained = True
+                
+            if label not in known_face_names:
+                new_face_names = dict(known_face_names)
+                new_face_names[label] = reg_no
+                known_face_names = new_face_names
+                
+            profile = student or student_directory.get(reg_no)
+            if profile:
+                student_directory.set_label(label, profile)
+                
+                # Keep the student's class shard in step, if a camera has loaded it. A shard
+                # still loading may have read its students before this one got a label, so the
+                # samples are kept for the loader to apply before it installs the shard.
+                key = shard_key(profile.get('Dept'), profile.get('Year'))
+                with _shards_lock:
+                    shard = recognizer_shards.get(key)
+                    if shard is None and key in _shards_loading:
+                        _shards_pending_adds.setdefault(key, []).append((samples, labels, label, reg_no))
+                if shard is not None:
+                    _add_to_shard(shard, samples, labels, label, reg_no)
+                
+        print(f"Added {len(samples)} face sample(s) for {reg_no} (label {label}).")
+        return True
+    except Exception as e:
+        print(f"Error adding face samples: {e}")
+        return False
+
+def remove_face_samples(reg_no):
+    """
+    Drops a student from the live recognizer. Returns False if the backend can't
+    remove samples (LBPH) - call load_known_faces() instead.
+    """
+    reg_no = str(reg_no)
+    with model_lock:
+        label = next((l for l, r in known_face_names.items() if r == reg_no), None)
+        if label is None:
+            return True
+        if not recognizer.remove(label):
+            return False
+        # The label stays reserved in known_face_names, so it is never reused for someone else
+        for shard in list(recognizer_shards.values()):
+            if label in shard.known_face_names:
+                shard.recognizer.remove(label)
+                del shard.known_face_names[label]
+    student_directory.invalidate(reg_no)
+    print(f"Removed face samples for {reg_no} (label {label}).")
+    return True
+
+def shard_key(dept, year):
+    """Normalised (Dept, Year) key of a recognizer shard."""
+    return (str(dept or '').strip().upper(), str(year or '').strip())
+
+class RecognizerShard(object):
+    """
+    Recognizer trained on one class (Dept/Year) only. Uses the global label ids,
+    so known_face_names here is a subset of the global map. Guarded by model_lock.
+    """
+    def __init__(self, key):
+        self.key = key
+        self.recognizer = new_recognizer()
+        self.known_face_names = {}
+        self.is_trained = False
+
+# (Dept, Year) -> RecognizerShard, loaded in the background for the cameras bound to it
+# (CAMERAS 'shards') and dropped on a full retrain
+recognizer_shards = {}
+_shards_loading = set()
+_shards_pending_adds = {} # Key of a loading shard -> [(samples, labels, label, reg_no)] added meanwhile
+_shards_generation = 0 # Bumped by clear_shards(), so a load started before it is thrown away
+_shards_lock = threading.Lock()
+
+def load_shard(key):
+    """Trains a shard from the samples of the students in that Dept/Year."""
+    shard = RecognizerShard(key)
+    students = [s for s in get_students_by_class(*key) if shard_key(s.get('Dept'), s.get('Year')) == key]
+    with model_lock:
+        label_of = {reg_no: label for label, reg_no in known_face_names.items()}
+    
+    faces, ids = [], []
+    for reg_no, paths in collect_sample_paths(students):
+        label = label_of.get(reg_no)
+        if label is None:
+            continue # Not in the global model yet; add_face_samples will add them
+        shard.known_face_names[label] = reg_no
+        for face in decode_samples(paths):
+            if face is not None:
+                faces.append(face)
+                ids.append(label)
+    if faces:
+        shard.recognizer.train(faces, np.array(ids))
+        shard.is_trained = True
+    print(f"Loaded recognizer shard {key[0]}/{key[1]}: {len(faces)} faces, {len(shard.known_face_names)} students.")
+    return shard
+
+def request_shards(keys):
+    """Starts loading, on background threads, the shards that aren't loaded or loading yet."""
+    with _shards_lock:
+        missing = [key for key in keys if key not in recognizer_shards and key not in _shards_loading]
+        _shards_loading.update(missing)
+        generation = _shards_generation
+    for key in missing:
+        threading.Thread(target=_load_shard_in_background, args=(key, generation),
+                         name=f'shard-{key[0]}-{key[1]}', daemon=True).start()
+
+def _load_shard_in_background(key, generation):
+    try:
+        shard = load_shard(key)
+    except Exception as e:
+        print(f"Error loading recognizer shard {key[0]}/{key[1]}: {e}")
+        shard = None
+    with _shards_lock:
+        _shards_loading.discard(key)
+        pending = _shards_pending_adds.pop(key, [])
+        if shard is not None and generation == _shards_generation:
+            # Registrations made while loading (a student the load already read just gets
+            # their new samples twice, which doesn't change the match)
+            for samples, labels, label, reg_no in pending:
+                _add_to_shard(shard, samples, labels, label, reg_no)
+            recognizer_shards[key] = shard
+
+def _add_to_shard(shard, samples, labels, label, reg_no):
+    if shard.is_trained:
+        shard.recognizer.update(samples, labels)
+    else:
+        shard.recognizer.train(samples, labels)
+        shard.is_trained = True
+    shard.known_face_names[label] = reg_no
+
+def clear_shards():
+    global _shards_generation
+    with _shards_lock:
+        recognizer_shards.clear()
+        _shards_pending_adds.clear() # Any load in progress is thrown away and redone from the new samples
+        _shards_generation += 1
+
+def detect_faces(gray, config=None):
+    """
+    Haar detection on a copy downscaled by config['scale'].
+    Returns (x, y, w, h) boxes in full-resolution coordinates.
+    """
+    config = dict(DETECTION_CONFIG, **(config or {}))
+    scale = config['scale']
+    min_w, min_h = config['min_size']
+    
+    small = gray
+    if scale != 1.0:
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+    boxes = face_cascade.detectMultiScale(
+        small, config['scale_factor'], config['min_neighbors'],
+        minSize=(int(min_w * scale), int(min_h * scale))
+    )
+    if scale == 1.0:
+        return [tuple(int(v) for v in box) for box in boxes]
+        
+    frame_h, frame_w = gray.shape[:2]
+    faces = []
+    for (x, y, w, h) in boxes:
+        x, y = int(x / scale), int(y / scale)
+        w, h = min(int(w / scale), frame_w - x), min(int(h / scale), frame_h - y)
+        faces.append((x, y, w, h))
+    return faces
+
 def train_face(image_path, save_path):
     try:
         img = cv2.imread(image_path)
@@ -166,43 +689,215 @@ def train_face(image_path, save_path):
         
         faces = sorted(faces, key=lambda f: f[2]*f[3], reverse=True)
         (x, y, w, h) = faces[0]
-        face_img = cv2.resize(gray[y:y+h, x:x+w], (200, 200))
+        face_img = cv2.resize(gray[y:y+h, x:x+w], FACE_SIZE)
         cv2.imwrite(save_path, face_img)
         return True
     except:
         return False
 
 class VideoCamera(object):
-    def __init__(self):
-        self.video = cv2.VideoCapture(CAMERA_SOURCE)
+    """
+    Camera feed with recognition. Capture, processing and JPEG encoding run on
+    separate threads (see pipeline.py); get_frame() returns the newest encoded frame.
+    """
+    def __init__(self, source=CAMERA_SOURCE, detection_config=None, motion_config=None, shards=None):
+        self.video = cv2.VideoCapture(source)
+        # Dept/Year classes this camera recognizes; empty = every student (the global model)
+        self.shard_keys = [shard_key(dept, year) for dept, year in (shards or [])]
+        self.detection_config = dict(DETECTION_CONFIG, **(detection_config or {}))
+        motion_config = dict(MOTION_GATE_CONFIG, **(motion_config or {}))
+        self.motion_gate = None
+        if motion_config.pop('enabled'):
+            self.motion_gate = MotionGate(**motion_config)
+        self.faces_in_view = 0
+        self.localizer = FACE_LOCALIZER
+        if self.localizer == 'mesh' and not (use_liveness and face_mesh):
+            print("WARNING: FACE_LOCALIZER='mesh' needs MediaPipe FaceMesh; using Haar detection.")
+            self.localizer = 'haar'
+        # Ask the backend not to buffer old frames (ignored by backends that don't support it)
+        self.video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.tracking = DETECT_EVERY_N_FRAMES > 1
+        # Voting needs the same Track across frames, so faces are matched between detections
+        # (by IoU) even when every frame is detected
+        self.voting = IDENTITY_VOTE_CONFIG['votes'] > 1
+        self.keep_tracks = self.tracking or self.voting
+        self.tracker = FaceTracker(min_confidence=TRACK_MIN_CONFIDENCE)
+        self.frame_index = 0
+        self.roi_buffer = np.empty((0, FACE_SIZE[1], FACE_SIZE[0]), dtype=np.uint8) # Reused face crops
+        request_shards(self.shard_keys) # Train this camera's shards while the pipeline starts
+        self.pipeline = FramePipeline(self.read_frame, self.process_frame, self.encode_frame)
+        self.pipeline.start()
     
     def __del__(self):
-        self.video.release()
+        self.release()
+    
+    def release(self):
+        """Stops the pipeline threads, then frees the device."""
+        if getattr(self, 'pipeline', None) is not None:
+            self.pipeline.stop()
+        if getattr(self, 'video', None) is not None:
+            self.video.release()
+    
+    def get_frame(self, stop=None):
+        """Newest encoded frame; None once the source ended or `stop` (an Event) is set."""
+        return self.pipeline.get(stop)
+    
+    def stats(self):
+        """Per-stage fps / queue depth / dropped frame counters, plus motion gate and liveness state counters."""
+        stats = self.pipeline.stats()
+        if self.motion_gate is not None:
+            stats['motion_gate'] = self.motion_gate.stats()
+        stats['liveness_states'] = liveness_states.stats()
+        return stats
     
-    def get_frame(self):
+    def read_frame(self):
         success, frame = self.video.read()
         if not success: return None
+        return frame
+    
+    def encode_frame(self, frame):
+        ret, jpeg = cv2.imencode('.jpg', frame)
+        if not ret: return None
+        return jpeg.tobytes()
+    
+    def locate_faces(self, gray):
+        """
+        Returns this frame's faces as Tracks. In tracking mode the detector runs every
+        DETECT_EVERY_N_FRAMES frames (or sooner if a track is lost) and tracks carry
+        their boxes and identities in between; otherwise every frame is detected afresh
+        (and, with identity voting on, matched to the previous frame's tracks by IoU).
+        """
+        if not self.tracking:
+            boxes = detect_faces(gray, self.detection_config)
+            if self.keep_tracks:
+                return self.tracker.update(gray, boxes)
+            return [Track(0, box) for box in boxes]
         
+        self.frame_index += 1
+        if self.frame_index % DETECT_EVERY_N_FRAMES != 0 and self.tracker.tracks:
+            self.tracker.advance(gray)
+            if not self.tracker.needs_detection():
+                return self.tracker.tracks
+        return self.tracker.update(gray, detect_faces(gray, self.detection_config))
+    
+    def locate_faces_from_mesh(self, frame, gray, w, h):
+        """'mesh' mode: face boxes come from FaceMesh landmarks; each face keeps its own mesh."""
+        meshes, boxes = [], []
+        for lm in run_face_mesh(frame):
+            box = mesh_box(lm, w, h)
+            if box[2] > 0 and box[3] > 0: # Skip faces entirely outside the frame
+                meshes.append(lm)
+                boxes.append(box)
+        if self.keep_tracks:
+            faces = self.tracker.update(gray, boxes)
+        else:
+            faces = [Track(0, box) for box in boxes]
+        pair_meshes(faces, meshes, w, h)
+        return faces
+    
+    def recognition_models(self):
+        """The (recognizer, label map) pairs to search: this camera's shards, or the global model."""
+        if not self.shard_keys:
+            return [(recognizer, known_face_names)]
+        # A shard still loading is skipped (its faces stay unrecognized) rather than stalling the frame
+        request_shards(self.shard_keys)
+        shards = [recognizer_shards.get(key) for key in self.shard_keys]
+        return [(shard.recognizer, shard.known_face_names) for shard in shards if shard is not None and shard.is_trained]
+    
+    def extract_rois(self, gray, faces):
+        """
+        Crops and resizes every face into one reused (N, h, w) uint8 array (grown when a
+        frame has more faces than ever before). Returns a view of the first len(faces).
+        """
+        if len(faces) > len(self.roi_buffer):
+            self.roi_buffer = np.empty((max(len(faces), 2 * len(self.roi_buffer)), FACE_SIZE[1], FACE_SIZE[0]),
+                                       dtype=np.uint8)
+        for i, track in enumerate(faces):
+            (x, y, wa, ha) = track.box
+            cv2.resize(gray[y:y+ha, x:x+wa], FACE_SIZE, dst=self.roi_buffer[i])
+        return self.roi_buffer[:len(faces)]
+    
+    def recognize_faces(self, faces, gray):
+        """
+        Runs the recognizer on new faces (fresh, unidentified tracks): all of the
+        frame's crops are scored together with one predict_batch() per model.
+        """
+        new_faces = [track for track in faces if track.reg_no is None and track.fresh]
+        if not new_faces:
+            return
+        models = self.recognition_models() # Loads this camera's shards on first use
+        if not models:
+            return
+        rois = self.extract_rois(gray, new_faces)
+        
+        with model_lock:
+            results = [(model.predict_batch(rois), names, model.threshold) for model, names in models]
+            for i, track in enumerate(new_faces):
+                # Closest match over this camera's shards
+                (ids, confs), names, threshold = min(results, key=lambda result: result[0][1][i])
+                id_, conf = int(ids[i]), float(confs[i])
+                reg_no = names.get(id_)
+                
+                # Confidence Check (distance below the backend's threshold), then vote across frames
+                accepted = conf < threshold and reg_no is not None
+                if self.voting:
+                    track.vote(id_ if accepted else None, reg_no, conf,
+                               IDENTITY_VOTE_CONFIG['window'], IDENTITY_VOTE_CONFIG['votes'])
+                elif accepted:
+                    track.identify(id_, reg_no)
+    
+    def process_frame(self, frame):
         # Mirror for better UX
         frame = cv2.flip(frame, 1)
         
         h, w, _ = frame.shape
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
-        # 1. Detect Faces for Recognition
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+        # 0. Motion Gate: nothing in view and nothing moving -> skip detection and mesh
+        if self.motion_gate is not None and not self.motion_gate.should_process(gray, active=self.faces_in_view > 0):
+            return frame
+        
+        if self.localizer == 'mesh':
+            # 1. FaceMesh finds the faces and provides their liveness landmarks in one pass
+            faces = self.locate_faces_from_mesh(frame, gray, w, h)
+        else:
+            # 1. Detect (or track) Faces for Recognition
+            faces = self.locate_faces(gray)
+            for track in faces:
+                track.landmarks = None
+        self.faces_in_view = len(faces)
+        
+        # 2. Recognize new faces; tracked faces keep their identity
+        if is_trained:
+            self.recognize_faces(faces, gray)
         
-        # 2. MediaPipe Mesh for Liveness
-        keypoints = None
-        if use_liveness and face_mesh:
-            try:
-                keypoints = face_mesh.process(rgb_frame)
-            except Exception as e:
-                pass 
+        # 3. Student record and liveness state of each recognized face
+        identities = []
+        for track in faces:
+            if not is_trained or track.reg_no is None:
+                identities.append((None, None))
+                continue
+            student = student_directory.by_label(track.label) or student_directory.get(track.reg_no)
+            if student is None:
+                student = {'Name': track.reg_no, 'Dept': None, 'Year': None}
+            identities.append((student, liveness_states.get(track.reg_no)))
+        
+        # 4. MediaPipe Mesh for Liveness, only on the crops of faces still being verified.
+        # Unknown and already marked faces never reach FaceMesh (or the RGB conversion).
+        if self.localizer != 'mesh' and use_liveness and crop_face_mesh:
+            for track, (student, state) in zip(faces, identities):
+                if state is not None and needs_liveness(state):
+                    track.landmarks = run_face_mesh_crop(frame, track.box)
+        
+        # Liveness measurements for every face with a mesh
+        for track in faces:
+            if track.landmarks is not None:
+                track.ear = eye_aspect_ratio(track.landmarks)
+                track.head_turn = head_turn(track.landmarks)
         
         # Process Detected Faces
-        for (x, y, wa, ha) in faces:
+        for track, (student, state) in zip(faces, identities):
+            (x, y, wa, ha) = track.box
             cv2.rectangle(frame, (x, y), (x+wa, y+ha), (0, 255, 0), 2)
             
             name = "Unknown"
@@ -210,75 +905,60 @@ class VideoCamera(object):
             color = (0, 255, 255) # Yellow
             
             if is_trained:
-                roi = cv2.resize(gray[y:y+ha, x:x+wa], (200, 200))
-                id_, conf = recognizer.predict(roi)
-                
-                # Confidence Check
-                if conf < 65 and id_ in known_face_names:
-                    reg_no = known_face_names[id_]
-                    full_name = get_student_by_reg(reg_no)['Name']
+                reg_no = track.reg_no
+                if reg_no is not None:
+                    full_name = student['Name']
                     name = full_name
                     
                     # --- LIVENESS LOGIC ---
-                    if reg_no not in liveness_states:
-                        liveness_states[reg_no] = {
-                            'stage': STAGE_WAITING_BLINK, 
-                            'marked': False,
-                            'blink_time': 0
-                        }
-                    
-                    state = liveness_states[reg_no]
-                    
                     if state['marked']:
-                        status_msg = "Attendance Marked"
+                        status_msg = "Saving Attendance..." if state.get('pending') else "Attendance Marked"
                         color = (0, 255, 0) # Green
                     elif use_liveness:
-                        if keypoints and keypoints.multi_face_landmarks:
-                            # Use first detection for simplicity
-                            lm = keypoints.multi_face_landmarks[0].landmark
-                            
-                            # 1. Blink Check
-                            if state['stage'] == STAGE_WAITING_BLINK:
-                                ear = (calculate_ear(lm, LEFT_EYE, w, h) + calculate_ear(lm, RIGHT_EYE, w, h)) / 2
-                                if ear < EAR_THRESHOLD:
-                                    # Eyes closed
-                                    state['blink_time'] = time.time()
-                                else:
-                                    # Eyes open
-                                    if state['blink_time'] > 0 and (time.time() - state['blink_time'] < 1.0):
-                                        # Just opened after closing -> Valid Blink
-                                        state['stage'] = STAGE_WAITING_HEAD_TURN
-                                        state['blink_time'] = 0 
-                                    else:
-                                        state['blink_time'] = 0
-                                        
-                                status_msg = "Please BLINK eyes"
-                                color = (0, 165, 255) # Orange
-                                
-                            # 2. Head Turn Check
-                            elif state['stage'] == STAGE_WAITING_HEAD_TURN:
-                                head_turn = get_head_pose(lm, w, h)
-                                # Threshold: +/- 0.3 (approx 30% turn)
-                                if abs(head_turn) > 0.3:
-                                    state['stage'] = STAGE_VERIFIED
-                                else:
-                                    status_msg = "Turn Head Left/Right"
-                                    color = (0, 200, 255) # Yellow-Orange
-                                    
-                            # 3. Verified
-                            elif state['stage'] == STAGE_VERIFIED:
-                                mark_attendance(reg_no, full_name, "Dept", "Year") 
-                                state['marked'] = True
+                        # 3. Verified: nothing left to check, no landmarks needed
+                        if state['stage'] == STAGE_VERIFIED:
+                            if queue_attendance(state, reg_no, full_name, student['Dept'], student['Year']):
                                 status_msg = "VERIFIED! Marked."
                                 color = (0, 255, 0)
-                        else:
+                            else:
+                                status_msg = "VERIFIED! Saving..."
+                                color = (0, 200, 255)
+                        elif track.landmarks is None:
                             status_msg = "Face not clear"
+                            
+                        # 1. Blink Check
+                        elif state['stage'] == STAGE_WAITING_BLINK:
+                            if track.ear < EAR_THRESHOLD:
+                                # Eyes closed
+                                state['blink_time'] = time.time()
+                            else:
+                                # Eyes open
+                                if state['blink_time'] > 0 and (time.time() - state['blink_time'] < 1.0):
+                                    # Just opened after closing -> Valid Blink
+                                    state['stage'] = STAGE_WAITING_HEAD_TURN
+                                    state['blink_time'] = 0 
+                                else:
+                                    state['blink_time'] = 0
+                                    
+                            status_msg = "Please BLINK eyes"
+                            color = (0, 165, 255) # Orange
+                            
+                        # 2. Head Turn Check
+                        elif state['stage'] == STAGE_WAITING_HEAD_TURN:
+                            # Threshold: +/- 0.3 (approx 30% turn)
+                            if abs(track.head_turn) > 0.3:
+                                state['stage'] = STAGE_VERIFIED
+                            else:
+                                status_msg = "Turn Head Left/Right"
+                                color = (0, 200, 255) # Yellow-Orange
                     else:
                         # No Liveness -> Auto Mark (Fallback)
-                        mark_attendance(reg_no, full_name, "Dept", "Year")
-                        state['marked'] = True
-                        status_msg = "Marked (No Liveness)"
-                        color = (0, 255, 0)
+                        if queue_attendance(state, reg_no, full_name, student['Dept'], student['Year']):
+                            status_msg = "Marked (No Liveness)"
+                            color = (0, 255, 0)
+                        else:
+                            status_msg = "Saving..."
+                            color = (0, 200, 255)
 
                 else:
                     name = "Unknown"
@@ -288,7 +968,4 @@ class VideoCamera(object):
             cv2.putText(frame, name, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
             cv2.putText(frame, status_msg, (x, y+ha+25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
-
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        return jpeg.tobytes()
-
+        return frame
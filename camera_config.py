@@ -8,3 +8,119 @@ CAMERA_SOURCE = 0
 
 # Example for IP Webcam:
 # CAMERA_SOURCE = 'http://192.168.0.104:8080/video'
+
+# Multi-Camera Setup
+# One entry per camera, streamed at /video_feed/<id> (/video_feed shows the first one).
+# - 'source':    same format as CAMERA_SOURCE
+# - 'detection': optional overrides of DETECTION_CONFIG (below) for this camera
+# - 'motion':    optional overrides of MOTION_GATE_CONFIG (below) for this camera
+# - 'shards':    optional list of (Dept, Year) classes this camera recognizes, e.g. a lecture hall's
+#                class. Each class gets its own small recognizer, loaded in the background when the
+#                camera starts, so matching cost follows class size. Omit (or []) to recognize every student.
+CAMERAS = [
+    {'id': 'main', 'source': CAMERA_SOURCE, 'detection': {}, 'motion': {}},
+    # {'id': 'gate-2', 'source': 'http://192.168.0.105:8080/video', 'detection': {'scale': 0.5}},
+    # {'id': 'hall-b', 'source': 1, 'shards': [('CSE', '3'), ('IT', '3')]},
+]
+
+# Run each camera's recognition pipeline in its own process (uses one CPU core per camera).
+# False runs cameras as threads inside the web server process.
+CAMERA_PROCESSES = True
+# Seconds a camera may take to start (load faces, import MediaPipe, open the device) before its
+# first frame. After that, viewers give up on a camera that sends nothing for 10 seconds.
+CAMERA_STARTUP_TIMEOUT = 120
+
+# Face Sample Loading
+# Folder of the per-student face crops (data/encodings/<RegisterNo>/*.jpg) and the size every
+# crop is stored and recognized at. Shared by camera.py and sample_store.py.
+ENCODING_DIR = 'data/encodings'
+FACE_SIZE = (200, 200)
+# Number of threads used to decode/resize face images when (re)training the recognizer.
+# OpenCV releases the GIL while decoding, so this scales with CPU cores.
+FACE_LOAD_WORKERS = 4
+
+# Face Detection / Tracking
+# Run the Haar detector every N frames and follow faces with a cheap template tracker in between.
+# A tracked face keeps its recognized identity, so the recognizer only runs on new faces.
+# 1 = detect and recognize on every frame (no tracking).
+DETECT_EVERY_N_FRAMES = 1
+# Detect early when a tracked face's template match score drops below this (0-1).
+TRACK_MIN_CONFIDENCE = 0.5
+
+# Identity Voting
+# A face is only identified once `votes` of its last `window` recognitions (one per detection
+# frame) agree on the same student; after that it is not re-recognized while it stays tracked.
+# Stops a single noisy frame from starting liveness for the wrong student.
+# votes = 1 accepts the first match (the old behaviour).
+IDENTITY_VOTE_CONFIG = {
+    'window': 5,
+    'votes': 3
+}
+
+# Haar Detection Tuning (per camera - see benchmark_detection.py to choose values)
+# scale:         detect on a copy resized by this factor (0.5 = half resolution); boxes are
+#                mapped back to full resolution for recognition. Big win on 1080p cameras.
+# scale_factor:  detectMultiScale pyramid step (larger = faster, may miss faces)
+# min_neighbors: detections needed to accept a face (larger = fewer false positives)
+# min_size:      smallest face to look for, in full-resolution pixels ((0, 0) = cascade minimum)
+DETECTION_CONFIG = {
+    'scale': 1.0,
+    'scale_factor': 1.3,
+    'min_neighbors': 5,
+    'min_size': (0, 0)
+}
+
+# Motion Gate
+# Skip face detection and FaceMesh while the scene is empty and nothing moves.
+# enabled:           turn the gate on/off
+# threshold:         fraction of (thumbnail) pixels that must change to count as motion
+# pixel_delta:       grey-level difference that counts as a changed pixel
+# min_detection_fps: still run detection at least this often on a static scene (0 = never)
+# hold:              seconds to keep processing after the last motion
+MOTION_GATE_CONFIG = {
+    'enabled': False,
+    'threshold': 0.01,
+    'pixel_delta': 15,
+    'min_detection_fps': 0.5,
+    'hold': 1.0
+}
+
+# Face Localisation
+# 'haar': Haar cascade finds faces; FaceMesh (if available) runs alongside for liveness.
+# 'mesh': FaceMesh alone finds faces and supplies liveness landmarks - one model per frame
+#         instead of two. Needs MediaPipe; falls back to 'haar' without it.
+FACE_LOCALIZER = 'haar'
+# Padding around the landmark bounding box for the recognizer crop in 'mesh' mode
+MESH_BOX_MARGIN = 0.1
+# Padding around the Haar box (fraction of its size, each side) for the FaceMesh liveness crop in
+# 'haar' mode. FaceMesh only runs on faces that are recognized and still waiting to blink / turn.
+LIVENESS_CROP_MARGIN = 0.25
+
+# Liveness State
+# Per-student blink / head-turn / marked state kept by the camera pipeline.
+# evening_start: 'HH:MM' splitting the day into the Morning IN and Evening OUT periods. Every state
+#                resets when a period starts (and at midnight). A marked student stays marked for the
+#                rest of the period, so the only second mark of the day is their first sighting after
+#                evening_start - a student who steps out for lunch is not marked OUT on return.
+#                The database keeps that first OUT time (later sightings are "already complete").
+# ttl:           seconds a student who is not marked yet can be out of view before their half-done
+#                blink / head-turn check is forgotten. 0 = keep until the period ends.
+# max_size:      most students tracked at once; the least recently seen unmarked ones are dropped first
+LIVENESS_STATE_CONFIG = {
+    'evening_start': '15:00',
+    'ttl': 1800,
+    'max_size': 1000
+}
+
+# Face Recognizer Backend (see recognizers.py)
+# 'lbph':    OpenCV LBPH. Compares each face with every stored sample in turn; can't remove samples.
+# 'gallery': NumPy gallery index. All samples' LBP histograms in one matrix, matched with a single
+#            matrix product; students can be added and removed without a retrain.
+#            Memory: about 4 * 59 * grid cells bytes per sample (~11 KB with a 7x7 grid).
+# Each backend has its own distance threshold: a face is accepted below it. The gallery threshold is
+# a Hellinger distance (0-1); tune it on your own registrations.
+RECOGNIZER_BACKEND = 'lbph'
+RECOGNIZER_CONFIG = {
+    'lbph': {'threshold': 65},
+    'gallery': {'threshold': 0.4, 'grid': (7, 7), 'face_size': (100, 100)}
+}
@@ -0,0 +1,263 @@
+"""
+Runs each configured camera in its own worker process.
+
+Vision work (detection, recognition, liveness, JPEG encoding) happens in a
+child process per camera, so several cameras use several cores instead of
+sharing the web server's GIL. The parent receives annotated JPEGs over a
+small frame queue; attendance marks from every child are sent back over one
+shared event queue and written by the parent's single AttendanceWriter.
+Each child has its own liveness states, so the parent also remembers who was
+marked in the current attendance period: a student seen by a second camera
+is not marked twice.
+
+CameraProcess has the same get_frame() / release() / stats() surface as
+camera.VideoCamera, so broadcast.CameraBroadcaster can drive either.
+"""
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+
+from attendance_writer import attendance_writer
+from camera_config import LIVENESS_STATE_CONFIG, CAMERA_STARTUP_TIMEOUT
+from liveness import LivenessStateStore
+
+# 'spawn' gives every worker a fresh interpreter: no inherited MySQL pool sockets or
+# camera handles from the web server, and the same behaviour on Windows and Linux.
+_ctx = multiprocessing.get_context('spawn')
+
+FRAME_QUEUE_SIZE = 2   # JPEGs buffered between a camera process and its viewers
+EVENT_QUEUE_SIZE = 500 # Attendance events buffered from all camera processes
+READY = 'ready'        # Sent once by a camera process when it has started, before its first frame
+
+def _put_latest(q, item):
+    """Puts item on a bounded queue, discarding the oldest entry if it is full."""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            pass
+
+class RemoteAttendanceWriter(object):
+    """
+    Stand-in for AttendanceWriter inside a camera process: forwards marks to the
+    parent and runs the callbacks when the parent reports the write result.
+    """
+    def __init__(self, channel, event_queue, result_queue):
+        self.channel = channel # This process's own result channel (see AttendanceRelay.register)
+        self.event_queue = event_queue
+        self.result_queue = result_queue
+        self._callbacks = {}
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        threading.Thread(target=self._results_loop, name='attendance-results', daemon=True).start()
+
+    def submit(self, reg_no, name, dept, year, callback=None):
+        token = next(self._tokens)
+        with self._lock:
+            self._callbacks[token] = callback
+        try:
+            self.event_queue.put_nowait((self.channel, token, reg_no, name, dept, year))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._callbacks.pop(token, None)
+            return False
+
+    def _results_loop(self):
+        while True:
+            token, success, msg = self.result_queue.get()
+            with self._lock:
+                callback = self._callbacks.pop(token, None)
+            if callback is not None:
+                try:
+                    callback(success, msg)
+                except Exception as e:
+                    print(f"Attendance callback error: {e}")
+
+def _control_loop(control_queue):
+    """Applies recognizer changes made in the web server (registrations, new variants, removals)."""
+    import camera
+
+    while True:
+        kind, reg_no, image_paths, student = control_queue.get()
+        if kind == 'add':
+            camera.add_face_samples(reg_no, image_paths, student=student)
+        elif kind == 'remove' and not camera.remove_face_samples(reg_no):
+            camera.load_known_faces() # Backend can't drop one student: retrain without them
+
+def _camera_process_main(camera_def, channel, frame_queue, event_queue, result_queue, control_queue, stop_event):
+    """Entry point of a camera worker process."""
+    import camera
+
+    camera.set_attendance_sink(RemoteAttendanceWriter(channel, event_queue, result_queue))
+    # When the server was started with `python app.py`, spawn has already re-imported
+    # app.py here (as __mp_main__), which loaded the faces once
+    if not camera.is_trained:
+        camera.load_known_faces(use_snapshot=True)
+    threading.Thread(target=_control_loop, args=(control_queue,), name='camera-control', daemon=True).start()
+
+    cam = camera.VideoCamera(camera_def['source'], camera_def.get('detection'), camera_def.get('motion'),
+                             camera_def.get('shards'))
+    frame_queue.put((READY, None))
+    try:
+        while not stop_event.is_set():
+            frame = cam.get_frame(stop_event)
+            if frame is None:
+                break
+            _put_latest(frame_queue, (frame, cam.stats()))
+    finally:
+        cam.release()
+        _put_latest(frame_queue, (None, None)) # Tell the parent the source ended
+
+class AttendanceRelay(object):
+    """
+    Parent side: feeds marks from every camera process into the single attendance writer.
+    A mark for a student already marked through another camera in the same attendance
+    period (morning / evening, see LIVENESS_STATE_CONFIG) is answered from `marks`
+    without writing again. Entries are kept until the period ends, not expired by ttl:
+    the relay only hears of marks, not sightings, so it can't tell how long ago a
+    student was last seen.
+    """
+    def __init__(self, writer):
+        self.writer = writer
+        self.event_queue = _ctx.Queue(EVENT_QUEUE_SIZE)
+        self.result_queues = {} # channel -> result queue of one camera process
+        self._channels = itertools.count(1)
+        # reg_no -> {'marked', 'msg'}; one small dict per student marked this period, so no size cap
+        self.marks = LivenessStateStore(dict, **dict(LIVENESS_STATE_CONFIG, ttl=0, max_size=0))
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def register(self):
+        """
+        Returns (channel, result queue) for a new camera process, starting the relay thread
+        if needed. Every process gets a fresh channel, so a restarted camera never receives
+        results meant for its predecessor (whose tokens started from 1 too).
+        """
+        with self._lock:
+            channel = next(self._channels)
+            self.result_queues[channel] = _ctx.Queue()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='attendance-relay', daemon=True)
+                self._thread.start()
+            return channel, self.result_queues[channel]
+
+    def unregister(self, channel):
+        with self._lock:
+            self.result_queues.pop(channel, None)
+
+    def _run(self):
+        while True:
+            channel, token, reg_no, name, dept, year = self.event_queue.get()
+            with self._lock:
+                results = self.result_queues.get(channel) # None once that process has gone
+
+            state = self.marks.get(reg_no)
+            if state.get('marked'):
+                if results is not None:
+                    results.put((token, True, state.get('msg') or "Attendance Marked")) # Marked via another camera
+                continue
+            state['marked'] = True
+
+            def on_written(success, msg, results=results, token=token, state=state):
+                if success:
+                    state['msg'] = msg
+                else:
+                    state['marked'] = False
+                if results is not None:
+                    results.put((token, success, msg))
+
+            if not self.writer.submit(reg_no, name, dept, year, callback=on_written):
+                on_written(False, "Attendance queue full") # Camera will retry on a later frame
+
+attendance_relay = AttendanceRelay(attendance_writer)
+
+_live_processes = set()
+_live_lock = threading.Lock()
+
+def _forward(message):
+    with _live_lock:
+        processes = list(_live_processes)
+    for camera_process in processes:
+        camera_process.control_queue.put(message)
+
+def forward_face_samples(reg_no, image_paths, student=None):
+    """Sends new face samples to every running camera process (see camera.add_face_samples)."""
+    _forward(('add', str(reg_no), list(image_paths), student))
+
+def forward_face_removal(reg_no):
+    """Tells every running camera process to drop a student (see camera.remove_face_samples)."""
+    _forward(('remove', str(reg_no), [], None))
+
+class CameraProcess(object):
+    """
+    Parent-side handle for one camera worker process. Until the process reports
+    READY, get_frame() waits up to startup_timeout; after that it waits as long as the
+    process is alive. Either way it checks the caller's stop event every `poll` seconds.
+    """
+    def __init__(self, camera_def, poll=0.5, startup_timeout=CAMERA_STARTUP_TIMEOUT):
+        self.camera_id = camera_def['id']
+        self.poll = poll
+        self.startup_timeout = startup_timeout
+        self._ready = False
+        self.frame_queue = _ctx.Queue(FRAME_QUEUE_SIZE)
+        self.control_queue = _ctx.Queue()
+        self.stop_event = _ctx.Event()
+        self._stats = None
+        self.channel, result_queue = attendance_relay.register()
+        self.process = _ctx.Process(
+            target=_camera_process_main,
+            args=(camera_def, self.channel, self.frame_queue, attendance_relay.event_queue,
+                  result_queue, self.control_queue, self.stop_event),
+            name=f'camera-{self.camera_id}',
+            daemon=True
+        )
+        self.process.start()
+        with _live_lock:
+            _live_processes.add(self)
+
+    def get_frame(self, stop=None):
+        """Newest frame; None once the source ended, the process didn't start in time, or `stop` is set."""
+        startup_deadline = time.monotonic() + self.startup_timeout
+        while stop is None or not stop.is_set():
+            try:
+                frame, stats = self.frame_queue.get(timeout=self.poll)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    return None
+                if not self._ready and time.monotonic() > startup_deadline:
+                    return None
+                continue # Slow frame; the child sends None itself when its source ends
+            if frame == READY:
+                self._ready = True
+                continue
+            self._stats = stats
+            return frame
+        return None
+
+    def stats(self):
+        return {'pid': self.process.pid, 'alive': self.process.is_alive(), 'stages': self._stats}
+
+    def release(self, timeout=5.0):
+        with _live_lock:
+            _live_processes.discard(self)
+        self.stop_event.set()
+        # Keep draining frames while waiting: a child can't exit with unsent queue data
+        deadline = time.monotonic() + timeout
+        while self.process.is_alive() and time.monotonic() < deadline:
+            try:
+                self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        attendance_relay.unregister(self.channel)
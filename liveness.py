@@ -0,0 +1,88 @@
+"""
+Per-student liveness state for the camera pipeline.
+
+Each recognized student gets a small state dict (liveness stage, 'marked',
+'pending', ...). The store forgets a student after `ttl` seconds out of view,
+keeps at most `max_size` students (dropping the least recently seen first)
+and is safe to share between camera threads.
+
+A student who is marked stays marked until the end of the attendance period,
+whatever the ttl: the day is split at `evening_start` into a morning period
+(the Morning IN mark) and an evening period (the Evening OUT mark), and every
+state is dropped when a new period starts. A student out of view over lunch
+therefore can't be marked OUT at lunchtime; their first sighting after
+evening_start is.
+"""
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+class LivenessStateStore(object):
+    def __init__(self, factory, ttl=1800, max_size=1000, evening_start='15:00'):
+        self.factory = factory   # Returns a fresh state dict for a newly seen student
+        self.ttl = ttl           # Seconds out of view before an unmarked student's state is dropped (0 = never)
+        self.max_size = max_size # Students kept at most (0 = no limit); unmarked, least recently seen go first
+        self.evening_start = datetime.datetime.strptime(evening_start, '%H:%M').time()
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._states = OrderedDict() # reg_no -> [state, last_seen], least recently seen first
+        self._period = self.period()
+
+    def period(self):
+        """(date, is_evening) of the attendance period now."""
+        now = datetime.datetime.now()
+        return now.date(), now.time() >= self.evening_start
+
+    def get(self, reg_no):
+        """Returns the student's state, starting a new one if there is none (or it expired)."""
+        now = time.monotonic()
+        with self._lock:
+            self._rollover()
+            entry = self._states.get(reg_no)
+            if entry is not None and self.ttl > 0 and now - entry[1] > self.ttl and not entry[0].get('marked'):
+                entry = None
+                self.expired += 1
+            if entry is None:
+                entry = [self.factory(), now]
+                self._states[reg_no] = entry
+                if self.max_size > 0 and len(self._states) > self.max_size:
+                    self._evict()
+            else:
+                entry[1] = now
+                self._states.move_to_end(reg_no)
+            return entry[0]
+
+    def discard(self, reg_no):
+        with self._lock:
+            self._states.pop(reg_no, None)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+    def __contains__(self, reg_no):
+        with self._lock:
+            return reg_no in self._states
+
+    def __len__(self):
+        return len(self._states)
+
+    def stats(self):
+        return {'students': len(self._states), 'expired': self.expired, 'evicted': self.evicted}
+
+    def _evict(self):
+        """Drops the least recently seen unmarked student, or the oldest one if all are marked (caller holds the lock)."""
+        victim = next((reg_no for reg_no, (state, _) in self._states.items() if not state.get('marked')), None)
+        if victim is None:
+            victim = next(iter(self._states))
+        del self._states[victim]
+        self.evicted += 1
+
+    def _rollover(self):
+        """New period (morning / evening, or a new day): everyone starts over (caller holds the lock)."""
+        period = self.period()
+        if period != self._period:
+            self._states.clear()
+            self._period = period
@@ -0,0 +1,204 @@
+"""
+Versioned schema migrations for the Smart Attendance database.
+
+Each entry in MIGRATIONS is (version, description, [steps]); a step is an
+SQL statement or a function taking the cursor. Applied versions are recorded
+in the `schema_migrations` table, so every migration runs exactly once per
+database. Add new migrations to the end of the list with the next version
+number - never edit one that has already shipped.
+
+MySQL DDL can't be rolled back, so a migration that fails part-way leaves
+its earlier steps applied and is run again from the start. Every step must
+therefore be safe to repeat: add indexes with add_index(), which skips an
+index that already exists (including one added by hand).
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # show applied / pending versions
+"""
+import argparse
+import mysql.connector
+
+from utils import get_db_connection
+
+# Named lock so several app workers starting together don't race on DDL
+MIGRATION_LOCK_NAME = 'smart_attendance_migrate'
+MIGRATION_LOCK_TIMEOUT = 30 # Seconds
+
+def add_index(table, name, columns, unique=False):
+    """Migration step: adds an index unless the table already has one with that name."""
+    def step(cursor):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+            (table, name)
+        )
+        if cursor.fetchone()[0]:
+            return
+        cursor.execute(f"ALTER TABLE {table} ADD {'UNIQUE ' if unique else ''}KEY {name} ({columns})")
+    return step
+
+MIGRATIONS = [
+    (1, "Create students, staff and attendance tables", [
+        """
+        CREATE TABLE IF NOT EXISTS students (
+            RegisterNo VARCHAR(50) PRIMARY KEY,
+            Name VARCHAR(100),
+            Dept VARCHAR(50),
+            Year VARCHAR(20),
+            Email VARCHAR(100),
+            Contact VARCHAR(20),
+            PhotoPath VARCHAR(255),
+            EncodingPath VARCHAR(255)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS staff (
+            Email VARCHAR(100) PRIMARY KEY,
+            Name VARCHAR(100),
+            Dept VARCHAR(50),
+            Contact VARCHAR(20),
+            Password VARCHAR(255)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            RegisterNo VARCHAR(50),
+            Name VARCHAR(100),
+            Date DATE,
+            Morning_IN TIME,
+            Evening_OUT TIME,
+            Dept VARCHAR(50),
+            Year VARCHAR(20),
+            Status VARCHAR(20),
+            FOREIGN KEY (RegisterNo) REFERENCES students(RegisterNo)
+        )
+        """,
+    ]),
+    (2, "Dedupe same-day attendance rows; index attendance(RegisterNo, Date), attendance(Date), students(Email)", [
+        # Concurrent marks could insert several rows for one student on one day.
+        # Fold them into the oldest row (earliest IN, latest OUT) before adding the unique key.
+        """
+        UPDATE attendance a
+        JOIN (
+            SELECT MIN(id) AS keep_id, MIN(Morning_IN) AS first_in, MAX(Evening_OUT) AS last_out
+            FROM attendance
+            GROUP BY RegisterNo, Date
+            HAVING COUNT(*) > 1
+        ) d ON a.id = d.keep_id
+        SET a.Morning_IN = d.first_in, a.Evening_OUT = d.last_out
+        """,
+        """
+        DELETE a FROM attendance a
+        JOIN (
+            SELECT RegisterNo, Date, MIN(id) AS keep_id
+            FROM attendance
+            GROUP BY RegisterNo, Date
+            HAVING COUNT(*) > 1
+        ) d ON a.RegisterNo = d.RegisterNo AND a.Date = d.Date AND a.id <> d.keep_id
+        """,
+        add_index('attendance', 'uq_attendance_reg_date', 'RegisterNo, Date', unique=True),
+        add_index('attendance', 'idx_attendance_date', 'Date'),
+        add_index('students', 'idx_students_email', 'Email'),
+    ]),
+    (3, "Index students(Dept, Year) for per-class recognizer shards", [
+        add_index('students', 'idx_students_class', 'Dept, Year'),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(255),
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def get_applied_versions(cursor):
+    """Returns the set of migration versions already applied."""
+    _ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def migrate(verbose=True):
+    """
+    Applies all pending migrations in order.
+    Returns the schema version after running, or None if the database is unreachable.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        print("Failed to run migrations. Check your connection settings.")
+        return None
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            print("Could not acquire migration lock - another process may be migrating.")
+            return None
+
+        try:
+            applied = get_applied_versions(cursor)
+            for version, description, steps in MIGRATIONS:
+                if version in applied:
+                    continue
+                if verbose:
+                    print(f"Applying migration {version}: {description}")
+                # Note: MySQL DDL commits implicitly, so a migration is recorded
+                # only after all of its steps have succeeded.
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+
+            current = max(get_applied_versions(cursor), default=0)
+            if verbose:
+                print(f"Database schema at version {current}.")
+            return current
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+            cursor.fetchone()
+    except mysql.connector.Error as err:
+        print(f"Error running migrations: {err}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+def status():
+    """Prints applied and pending migrations."""
+    conn = get_db_connection()
+    if conn is None:
+        print("Failed to connect to database. Check your connection settings.")
+        return
+
+    cursor = conn.cursor()
+    try:
+        applied = get_applied_versions(cursor)
+        conn.commit()
+        for version, description, _ in MIGRATIONS:
+            mark = "applied" if version in applied else "pending"
+            print(f"[{mark:>7}] {version}: {description}")
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Attendance schema migrations")
+    parser.add_argument('command', nargs='?', default='upgrade', choices=['upgrade', 'status'])
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        status()
+    else:
+        migrate()
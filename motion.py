@@ -0,0 +1,62 @@
+"""
+Motion gate for the camera pipeline.
+
+Compares each frame with the previous one on a tiny blurred thumbnail and
+tells the caller whether anything moved. On an empty, static scene the
+expensive stages (Haar detection, FaceMesh) can be skipped; any motion
+re-opens the gate on that same frame.
+"""
+import time
+
+import cv2
+import numpy as np
+
+class MotionGate(object):
+    def __init__(self, threshold=0.01, pixel_delta=15, min_detection_fps=0.5, hold=1.0, width=80):
+        self.threshold = threshold                 # Fraction of thumbnail pixels that must change
+        self.pixel_delta = pixel_delta             # Grey-level change that counts as a changed pixel
+        self.min_detection_fps = min_detection_fps # Let a frame through at least this often (0 = never)
+        self.hold = hold                           # Seconds to stay open after the last motion
+        self.width = width                         # Thumbnail width in pixels
+        self.frames_skipped = 0
+        self.frames_passed = 0
+        self._previous = None
+        self._last_motion = 0.0
+        self._last_pass = 0.0
+
+    def _thumbnail(self, gray):
+        h, w = gray.shape[:2]
+        size = (self.width, max(1, int(h * self.width / w)))
+        return cv2.GaussianBlur(cv2.resize(gray, size, interpolation=cv2.INTER_AREA), (5, 5), 0)
+
+    def has_motion(self, gray):
+        thumb = self._thumbnail(gray)
+        previous, self._previous = self._previous, thumb
+        if previous is None or previous.shape != thumb.shape:
+            return True
+        changed = np.count_nonzero(cv2.absdiff(thumb, previous) > self.pixel_delta)
+        return changed > self.threshold * thumb.size
+
+    def should_process(self, gray, active=False):
+        """
+        True if this frame should go through detection. `active` keeps the gate open
+        while faces are in view (a student standing still still needs liveness checks).
+        """
+        now = time.monotonic()
+        if self.has_motion(gray):
+            self._last_motion = now
+
+        open_ = (
+            active
+            or now - self._last_motion <= self.hold
+            or (self.min_detection_fps > 0 and now - self._last_pass >= 1.0 / self.min_detection_fps)
+        )
+        if open_:
+            self._last_pass = now
+            self.frames_passed += 1
+        else:
+            self.frames_skipped += 1
+        return open_
+
+    def stats(self):
+        return {'frames_passed': self.frames_passed, 'frames_skipped': self.frames_skipped}
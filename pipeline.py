@@ -0,0 +1,153 @@
+"""
+Threaded capture -> process -> encode pipeline for the camera feed.
+
+Stages are connected by LatestSlot hand-offs that hold at most one item:
+when a stage falls behind, the stage feeding it overwrites the waiting
+item instead of queueing it, so the displayed feed never lags behind
+reality - stale frames are dropped (and counted) instead.
+"""
+import threading
+import time
+
+class LatestSlot(object):
+    """Single-item hand-off between two threads. put() replaces any item not yet taken."""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Waits for the next item. Returns None on timeout or once the slot is closed."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._item is not None or self._closed, timeout):
+                return None
+            item, self._item = self._item, None
+            return item
+
+    def depth(self):
+        return 0 if self._item is None else 1
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class StageStats(object):
+    """Frame counter with a smoothed frames-per-second estimate."""
+    def __init__(self):
+        self.frames = 0
+        self.fps = 0.0
+        self._last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._last is not None and now > self._last:
+            instant = 1.0 / (now - self._last)
+            self.fps = instant if self.fps == 0 else 0.9 * self.fps + 0.1 * instant
+        self._last = now
+        self.frames += 1
+
+class FramePipeline(object):
+    """
+    Runs read_frame, process_frame and encode_frame on three threads.
+    read_frame() returns a frame or None when the source has ended;
+    get() returns the newest encoded frame, or None once the pipeline stopped.
+    """
+    STAGES = ('capture', 'process', 'encode')
+
+    def __init__(self, read_frame, process_frame, encode_frame, max_read_failures=5):
+        self.read_frame = read_frame
+        self.process_frame = process_frame
+        self.encode_frame = encode_frame
+        self.max_read_failures = max_read_failures
+        self.slots = {stage: LatestSlot() for stage in self.STAGES} # Output slot of each stage
+        self.stats_by_stage = {stage: StageStats() for stage in self.STAGES}
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        targets = (self._capture_loop, self._process_loop, self._encode_loop)
+        for stage, target in zip(self.STAGES, targets):
+            thread = threading.Thread(target=target, name=f'camera-{stage}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        for slot in self.slots.values():
+            slot.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def get(self, stop=None, poll=0.5):
+        """
+        Newest encoded frame (blocks until one is ready). A slow frame is waited for,
+        checking every `poll` seconds whether the pipeline stopped or the caller's `stop`
+        event is set; only then is None returned.
+        """
+        while not self._stop.is_set() and not (stop is not None and stop.is_set()):
+            frame = self.slots['encode'].get(poll)
+            if frame is not None:
+                return frame
+        return None
+
+    def stats(self):
+        """Per stage: fps, frames handled, items waiting in its output slot, frames dropped there."""
+        return {
+            stage: {
+                'fps': round(self.stats_by_stage[stage].fps, 1),
+                'frames': self.stats_by_stage[stage].frames,
+                'queue_depth': self.slots[stage].depth(),
+                'dropped': self.slots[stage].dropped
+            }
+            for stage in self.STAGES
+        }
+
+    def _capture_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            frame = self.read_frame()
+            if frame is None:
+                failures += 1
+                if failures >= self.max_read_failures:
+                    print("Camera pipeline: source stopped delivering frames.")
+                    self.stop()
+                    return
+                time.sleep(0.05)
+                continue
+            failures = 0
+            self.stats_by_stage['capture'].tick()
+            self.slots['capture'].put(frame)
+
+    def _run_stage(self, stage, source, func):
+        while not self._stop.is_set():
+            item = self.slots[source].get(timeout=0.5)
+            if item is None:
+                continue
+            try:
+                result = func(item)
+            except Exception as e:
+                print(f"Camera pipeline {stage} error: {e}")
+                continue
+            if result is not None:
+                self.stats_by_stage[stage].tick()
+                self.slots[stage].put(result)
+
+    def _process_loop(self):
+        self._run_stage('process', 'capture', self.process_frame)
+
+    def _encode_loop(self):
+        self._run_stage('encode', 'process', self.encode_frame)
@@ -0,0 +1,237 @@
+"""
+Face recognizer backends.
+
+Every backend maps 200x200 grayscale face crops to integer labels and has the
+same surface, so camera.py can switch between them (RECOGNIZER_BACKEND in
+camera_config.py):
+
+    train(faces, labels)   replace everything with these samples
+    update(faces, labels)  append samples
+    remove(label)          drop every sample of one label (False if unsupported)
+    predict(face)          -> (label, distance); smaller distance = closer match
+    predict_batch(faces)   -> (labels, distances), each (len(faces),)
+    search(faces, k)       -> (labels, distances), each (len(faces), k), best first
+    write(path) / read(path)
+
+`threshold` is the backend's own distance cut-off for accepting a match.
+
+LBPHBackend wraps OpenCV's LBPH, which compares the probe with every stored
+sample one by one. GalleryIndexBackend keeps one normalised LBP histogram
+per sample in a contiguous NumPy matrix, so a search is one matrix product
+over the whole gallery and samples can be added or removed per student.
+"""
+import abc
+
+import cv2
+import numpy as np
+
+class RecognizerBackend(abc.ABC):
+    name = None
+    model_file = None # File name of the saved model inside MODEL_DIR
+    threshold = 0.0
+
+    @abc.abstractmethod
+    def train(self, faces, labels):
+        pass
+
+    @abc.abstractmethod
+    def update(self, faces, labels):
+        pass
+
+    def remove(self, label):
+        """Drops every sample of label. Returns False if the backend needs a full retrain instead."""
+        return False
+
+    @abc.abstractmethod
+    def predict(self, face):
+        pass
+
+    def search(self, faces, k=1):
+        """Best matches for several faces. The default only knows the single best match."""
+        results = [self.predict(face) for face in faces]
+        labels = np.array([[label] for label, _ in results], dtype=np.int32).reshape(-1, 1)
+        distances = np.array([[dist] for _, dist in results], dtype=np.float32).reshape(-1, 1)
+        return labels, distances
+
+    def predict_batch(self, faces):
+        """Best match for every face in a (N, h, w) stack, as two (N,) arrays."""
+        labels, distances = self.search(faces, 1)
+        return labels[:, 0], distances[:, 0]
+
+    @abc.abstractmethod
+    def write(self, path):
+        pass
+
+    @abc.abstractmethod
+    def read(self, path):
+        pass
+
+class LBPHBackend(RecognizerBackend):
+    """OpenCV LBPH. Distance is LBPH's chi-square confidence (65 = accept below)."""
+    name = 'lbph'
+    model_file = 'lbph_model.yml.gz' # .gz keeps the histogram dump small
+
+    def __init__(self, threshold=65, **params):
+        self.threshold = threshold
+        self.model = cv2.face.LBPHFaceRecognizer_create(**params)
+
+    def train(self, faces, labels):
+        self.model.train(faces, np.asarray(labels))
+
+    def update(self, faces, labels):
+        self.model.update(faces, np.asarray(labels))
+
+    def predict(self, face):
+        return self.model.predict(face)
+
+    def write(self, path):
+        self.model.write(path)
+
+    def read(self, path):
+        self.model.read(path)
+
+def _uniform_lbp_table():
+    """Maps the 256 8-bit LBP codes to 59 bins: 58 uniform patterns plus one for the rest."""
+    table = np.full(256, 58, dtype=np.intp)
+    uniform = 0
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(8)]
+        if sum(bits[i] != bits[(i + 1) % 8] for i in range(8)) <= 2:
+            table[code] = uniform
+            uniform += 1
+    return table
+
+_LBP_TABLE = _uniform_lbp_table()
+_LBP_BINS = 59
+# The 8 neighbours of each pixel, clockwise from top-left
+_LBP_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+
+def lbp_features(faces, grid=(7, 7), face_size=(100, 100)):
+    """
+    Uniform LBP histograms on a grid of cells for a batch of grayscale faces.
+    Each cell histogram is L1-normalised and square-rooted (Hellinger), and the
+    vector scaled to unit length, so the dot product of two features is their
+    Bhattacharyya coefficient. Returns (len(faces), grid cells * 59) float32.
+    """
+    width, height = face_size
+    imgs = np.stack([
+        face if face.shape[:2] == (height, width)
+        else cv2.resize(face, face_size, interpolation=cv2.INTER_AREA)
+        for face in faces
+    ])
+    center = imgs[:, 1:-1, 1:-1]
+    codes = np.zeros(center.shape, dtype=np.uint8)
+    for bit, (dy, dx) in enumerate(_LBP_OFFSETS):
+        neighbour = imgs[:, 1 + dy:height - 1 + dy, 1 + dx:width - 1 + dx]
+        codes |= (neighbour >= center).astype(np.uint8) << bit
+
+    gy, gx = grid
+    cells = gy * gx
+    inner_h, inner_w = height - 2, width - 2
+    cell_of = (np.arange(inner_h) * gy // inner_h)[:, None] * gx + (np.arange(inner_w) * gx // inner_w)[None, :]
+    bins = cell_of * _LBP_BINS + _LBP_TABLE[codes]                 # (F, H, W) bin within each face
+    bins += (np.arange(len(imgs)) * cells * _LBP_BINS)[:, None, None] # offset per face, one bincount for all
+    hist = np.bincount(bins.ravel(), minlength=len(imgs) * cells * _LBP_BINS)
+    hist = hist.reshape(len(imgs), cells, _LBP_BINS).astype(np.float32)
+
+    hist /= np.maximum(hist.sum(axis=2, keepdims=True), 1)
+    return (np.sqrt(hist) / np.float32(np.sqrt(cells))).reshape(len(imgs), -1)
+
+class GalleryIndexBackend(RecognizerBackend):
+    """
+    Every sample's LBP feature vector in one contiguous float32 matrix (grown by
+    doubling), with a parallel label array. Distance is the Hellinger distance
+    (0 = identical histograms, 1 = nothing in common).
+    """
+    name = 'gallery'
+    model_file = 'gallery_index.npz'
+
+    def __init__(self, threshold=0.4, grid=(7, 7), face_size=(100, 100)):
+        self.threshold = threshold
+        self.grid = tuple(grid)
+        self.face_size = tuple(face_size)
+        self.dim = self.grid[0] * self.grid[1] * _LBP_BINS
+        self._features = np.zeros((0, self.dim), dtype=np.float32)
+        self._labels = np.zeros(0, dtype=np.int32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def features(self, faces):
+        return lbp_features(faces, self.grid, self.face_size)
+
+    def train(self, faces, labels):
+        self._size = 0
+        self.update(faces, labels)
+
+    def update(self, faces, labels):
+        if len(faces) == 0:
+            return
+        self._append(self.features(faces), np.asarray(labels, dtype=np.int32))
+
+    def remove(self, label):
+        keep = self._labels[:self._size] != label
+        kept = int(keep.sum())
+        self._features[:kept] = self._features[:self._size][keep]
+        self._labels[:kept] = self._labels[:self._size][keep]
+        self._size = kept
+        return True
+
+    def predict(self, face):
+        labels, distances = self.search([face], 1)
+        return int(labels[0, 0]), float(distances[0, 0])
+
+    def search(self, faces, k=1):
+        """Top-k gallery samples for each face, by one (faces x gallery) matrix product."""
+        if self._size == 0:
+            return (np.full((len(faces), k), -1, dtype=np.int32),
+                    np.full((len(faces), k), np.inf, dtype=np.float32))
+        scores = self.features(faces) @ self._features[:self._size].T # Bhattacharyya coefficients
+        k_ = min(k, self._size)
+        if k_ < self._size:
+            top = np.argpartition(-scores, k_ - 1, axis=1)[:, :k_]
+        else:
+            top = np.broadcast_to(np.arange(self._size), (len(faces), self._size))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+        labels = np.full((len(faces), k), -1, dtype=np.int32)
+        distances = np.full((len(faces), k), np.inf, dtype=np.float32)
+        labels[:, :k_] = self._labels[top]
+        distances[:, :k_] = np.sqrt(np.clip(1.0 - top_scores, 0.0, None))
+        return labels, distances
+
+    def write(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, features=self._features[:self._size], labels=self._labels[:self._size],
+                     grid=np.array(self.grid), face_size=np.array(self.face_size))
+
+    def read(self, path):
+        with np.load(path) as data:
+            if tuple(data['grid']) != self.grid or tuple(data['face_size']) != self.face_size:
+                raise ValueError("saved gallery was built with different grid / face_size")
+            self._size = 0
+            self._append(data['features'], data['labels'])
+
+    def _append(self, features, labels):
+        end = self._size + len(features)
+        if end > len(self._features):
+            capacity = max(end, 2 * len(self._features), 64)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self._features[:self._size]
+            grown_labels = np.zeros(capacity, dtype=np.int32)
+            grown_labels[:self._size] = self._labels[:self._size]
+            self._features, self._labels = grown, grown_labels
+        self._features[self._size:end] = features
+        self._labels[self._size:end] = labels
+        self._size = end
+
+BACKENDS = {backend.name: backend for backend in (LBPHBackend, GalleryIndexBackend)}
+
+def create_recognizer(name, **params):
+    """New, empty backend by name ('lbph' or 'gallery')."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown recognizer backend: {name}")
+    return BACKENDS[name](**params)
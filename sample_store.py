@@ -0,0 +1,311 @@
+"""
+Packed face sample store.
+
+All face crops live in one flat file of 200x200 grayscale images, read through
+a NumPy memmap, plus a small JSON index (sample id, RegisterNo, slot in the
+data file, timestamp, source file, deleted flag). Loading the recognizer then
+needs no directory listing or JPEG decoding.
+
+- append: crops go on the end of the data file; the index is rewritten last,
+  so a crash part-way only leaves unused bytes behind.
+- delete: samples are only marked deleted (tombstones).
+- compact: live samples are copied to a new data file, which the index is then
+  switched to; deleted samples and stray bytes are dropped. The source paths of
+  dropped samples stay in the index (deleted_sources), so they are never imported
+  again.
+
+Created (and filled from the existing data/encodings JPEGs) by a one-time
+migration. Until then camera.py keeps reading the JPEGs directly.
+
+Usage (stop the server first):
+    python sample_store.py migrate      # import data/encodings into the store
+    python sample_store.py compact
+    python sample_store.py status
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from camera_config import ENCODING_DIR, FACE_SIZE
+
+SAMPLE_STORE_DIR = 'data/samples'
+
+class SampleStore(object):
+    def __init__(self, root=SAMPLE_STORE_DIR, face_size=FACE_SIZE):
+        self.root = root
+        self.face_size = tuple(face_size)
+        self.sample_bytes = self.face_size[0] * self.face_size[1]
+        self.index_path = os.path.join(root, 'index.json')
+        self._lock = threading.RLock()
+        self._index = None
+        self._by_id = {}
+        self._array = None
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    # --- Index ---
+
+    def _load(self):
+        if self._index is not None:
+            return self._index
+        if self.exists():
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if tuple(index['face_size']) != self.face_size:
+                raise ValueError(f"sample store holds {index['face_size']} crops, expected {self.face_size}")
+        else:
+            index = {'face_size': list(self.face_size), 'generation': 0, 'data_file': 'samples-0.u8',
+                     'next_id': 1, 'records': [], 'deleted_sources': []}
+        self._index = index
+        self._by_id = {record['id']: record for record in index['records']}
+        return index
+
+    def _save(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def reload(self):
+        """Forgets the cached index and memmap (e.g. after another process changed the store)."""
+        with self._lock:
+            self._index = None
+            self._array = None
+
+    @property
+    def data_path(self):
+        return os.path.join(self.root, self._load()['data_file'])
+
+    # --- Reading ---
+
+    def records(self, reg_no=None):
+        """Live (not deleted) index records, optionally for one student, oldest first."""
+        with self._lock:
+            records = [r for r in self._load()['records'] if not r['deleted']]
+        if reg_no is not None:
+            records = [r for r in records if r['reg_no'] == str(reg_no)]
+        return records
+
+    def sources(self):
+        """Normalised source file paths of every sample ever added, deleted ones included."""
+        with self._lock:
+            index = self._load()
+            sources = {os.path.normpath(r['source']) for r in index['records'] if r['source']}
+            return sources.union(index.get('deleted_sources', []))
+
+    def ids_by_reg(self):
+        """{reg_no: [sample ids]} of live samples."""
+        ids = {}
+        for record in self.records():
+            ids.setdefault(record['reg_no'], []).append(record['id'])
+        return ids
+
+    def array(self):
+        """Read-only memmap of every slot in the data file: (slots, h, w) uint8."""
+        with self._lock:
+            if self._array is None:
+                path = self.data_path
+                slots = os.path.getsize(path) // self.sample_bytes if os.path.exists(path) else 0
+                if slots == 0:
+                    return np.zeros((0, self.face_size[1], self.face_size[0]), dtype=np.uint8)
+                self._array = np.memmap(path, dtype=np.uint8, mode='r',
+                                        shape=(slots, self.face_size[1], self.face_size[0]))
+            return self._array
+
+    def get(self, sample_id):
+        """One sample as a (h, w) uint8 array, or None if unknown or deleted."""
+        with self._lock:
+            self._load()
+            record = self._by_id.get(int(sample_id))
+            if record is None or record['deleted']:
+                return None
+            array = self.array()
+            if record['slot'] >= len(array):
+                return None
+            return np.array(array[record['slot']])
+
+    # --- Writing ---
+
+    def append(self, reg_no, faces, source=None, timestamp=None):
+        """Adds grayscale crops (resized to face_size if needed) for one student. Returns their ids."""
+        return self.append_many([(reg_no, face, source, timestamp) for face in faces])
+
+    def append_many(self, entries):
+        """Adds [(reg_no, face, source, timestamp)] with a single index write. Returns their ids."""
+        faces = [
+            face if face.shape[:2] == (self.face_size[1], self.face_size[0]) else cv2.resize(face, self.face_size)
+            for _, face, _, _ in entries
+        ]
+        if not faces:
+            return []
+        with self._lock:
+            index = self._load()
+            os.makedirs(self.root, exist_ok=True)
+            path = self.data_path
+            with open(path, 'ab') as f:
+                # Next slot follows whatever is in the file, including bytes from an append that never got indexed
+                slot = f.tell() // self.sample_bytes
+                f.seek(slot * self.sample_bytes)
+                f.truncate()
+                for face in faces:
+                    f.write(np.ascontiguousarray(face, dtype=np.uint8).tobytes())
+            ids = []
+            for i, (reg_no, _, source, timestamp) in enumerate(entries):
+                record = {'id': index['next_id'], 'reg_no': str(reg_no), 'slot': slot + i,
+                          'ts': timestamp or time.time(), 'source': source, 'deleted': False}
+                index['next_id'] += 1
+                index['records'].append(record)
+                self._by_id[record['id']] = record
+                ids.append(record['id'])
+            self._save(index)
+            self._array = None # Re-open with the new length on next read
+            return ids
+
+    def add_files(self, reg_no, image_paths):
+        """Appends face crop image files (as written by camera.train_face). Unreadable files are skipped."""
+        return self.append_many(list(_read_files((reg_no, path) for path in image_paths)))
+
+    def delete(self, reg_no=None, ids=None):
+        """Tombstones every sample of a student, or the given sample ids. Returns how many."""
+        ids = set(int(i) for i in ids) if ids is not None else None
+        with self._lock:
+            index = self._load()
+            count = 0
+            for record in index['records']:
+                if record['deleted']:
+                    continue
+                if (reg_no is not None and record['reg_no'] == str(reg_no)) or (ids is not None and record['id'] in ids):
+                    record['deleted'] = True
+                    count += 1
+            if count:
+                self._save(index)
+            return count
+
+    def compact(self):
+        """Rewrites the data file with live samples only. Returns (kept, dropped)."""
+        with self._lock:
+            index = self._load()
+            live = [r for r in index['records'] if not r['deleted']]
+            old_path = self.data_path
+            array = self.array()
+
+            generation = index['generation'] + 1
+            data_file = f'samples-{generation}.u8'
+            with open(os.path.join(self.root, data_file), 'wb') as f:
+                for slot, record in enumerate(live):
+                    f.write(np.ascontiguousarray(array[record['slot']]).tobytes())
+                    record['slot'] = slot
+
+            dropped = len(index['records']) - len(live)
+            # Keep the dropped samples' sources, so migrate / collect_sample_paths still skip them
+            deleted_sources = set(index.get('deleted_sources', []))
+            deleted_sources.update(os.path.normpath(r['source']) for r in index['records'] if r['deleted'] and r['source'])
+            new_index = dict(index, generation=generation, data_file=data_file, records=live,
+                             deleted_sources=sorted(deleted_sources))
+            self._save(new_index) # Switch readers to the new file, then drop the old one
+            self._array = None
+            del array
+            self._index = new_index
+            self._by_id = {record['id']: record for record in live}
+            if os.path.exists(old_path) and old_path != self.data_path:
+                try:
+                    os.remove(old_path)
+                except OSError as e:
+                    print(f"Could not remove old sample file {old_path}: {e}") # Still mapped elsewhere (Windows)
+            return len(live), dropped
+
+    def stats(self):
+        with self._lock:
+            index = self._load()
+            records = index['records']
+            path = self.data_path
+            return {
+                'samples': sum(not r['deleted'] for r in records),
+                'deleted': sum(r['deleted'] for r in records),
+                'students': len({r['reg_no'] for r in records if not r['deleted']}),
+                'data_file': path,
+                'data_bytes': os.path.getsize(path) if os.path.exists(path) else 0
+            }
+
+# Shared instance; the web server is its only writer (camera processes only read)
+sample_store = SampleStore()
+
+def add_new_samples(reg_no, image_paths, store=sample_store):
+    """
+    Adds freshly saved face crops to the store, once it has been created by `migrate`.
+    Crops that fail to go in are still trained on from their JPEG (see camera.collect_sample_paths).
+    """
+    if not store.exists():
+        return []
+    try:
+        return store.add_files(reg_no, image_paths)
+    except Exception as e:
+        print(f"Error adding samples to store: {e}")
+        return []
+
+def _read_files(files):
+    """(reg_no, path) -> (reg_no, grayscale image, path, mtime), skipping files that can't be read."""
+    for reg_no, path in files:
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            yield reg_no, img, path, os.path.getmtime(path)
+
+def iter_encoding_files(encoding_dir=ENCODING_DIR):
+    """Yields (reg_no, path) for data/encodings/<RegisterNo>/*.jpg and legacy <RegisterNo>_cropped.jpg files."""
+    if not os.path.isdir(encoding_dir):
+        return
+    for name in sorted(os.listdir(encoding_dir)):
+        path = os.path.join(encoding_dir, name)
+        if os.path.isdir(path):
+            for file_name in sorted(os.listdir(path)):
+                if file_name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                    yield name, os.path.join(path, file_name)
+        elif name.lower().endswith(('_cropped.jpg', '_cropped.jpeg', '_cropped.png')):
+            yield name.rsplit('_cropped', 1)[0], path
+
+def migrate(store=sample_store, encoding_dir=ENCODING_DIR, batch_size=500):
+    """
+    One-time import of the JPEG layout into the store. Files already imported
+    (same source path, even if since deleted) are skipped, so it is safe to run again. The JPEGs are left in place.
+    Returns (imported, skipped, unreadable).
+    """
+    imported_sources = store.sources() # Deleted samples too, so they aren't brought back
+    pending = []
+    skipped = 0
+    for reg_no, path in iter_encoding_files(encoding_dir):
+        if os.path.normpath(path) in imported_sources:
+            skipped += 1
+        else:
+            pending.append((reg_no, path))
+
+    imported = 0
+    for start in range(0, len(pending), batch_size):
+        imported += len(store.append_many(list(_read_files(pending[start:start + batch_size]))))
+    return imported, skipped, len(pending) - imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Packed face sample store")
+    parser.add_argument('command', choices=['migrate', 'compact', 'status'])
+    parser.add_argument('--encodings', default=ENCODING_DIR, help="JPEG folder to migrate from")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        imported, skipped, unreadable = migrate(sample_store, args.encodings)
+        print(f"Imported {imported} samples ({skipped} already in the store, {unreadable} unreadable).")
+    elif args.command == 'compact':
+        kept, dropped = sample_store.compact()
+        print(f"Compacted: {kept} samples kept, {dropped} deleted samples dropped.")
+    if sample_store.exists():
+        print(sample_store.stats())
+    else:
+        print("No sample store yet - run: python sample_store.py migrate")
+
+if __name__ == "__main__":
+    main()
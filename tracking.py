@@ -0,0 +1,150 @@
+"""
+Lightweight face tracking between Haar detections.
+
+Detections are matched to existing tracks by IoU. Between detections each
+track follows its face with a small normalized template match around the
+last position; the match score is the track's confidence, and a low score
+tells the caller to run the detector again. A track keeps the identity
+recognised for it, so recognition does not have to run on every frame.
+Until then it collects one recognition vote per detection and commits to an
+identity once enough recent votes agree (see Track.vote).
+"""
+import itertools
+from collections import Counter
+import cv2
+import numpy as np
+
+TEMPLATE_WIDTH = 32 # Pixels; templates and search windows are scaled to this width
+SEARCH_MARGIN = 0.5 # Search window = box grown by this fraction of its size on each side
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+class Track(object):
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.confidence = 1.0 # Template match score since the last detection (1.0 = just detected)
+        self.fresh = True     # Box came from the detector this frame
+        self.template = None
+        self.label = None     # Recognizer label id, once identified
+        self.reg_no = None
+        self.landmarks = None # This frame's FaceMesh landmark points for this face, if any ((x, y) pixels)
+        self.ear = 0.0        # Eye aspect ratio / head turn measured from those landmarks
+        self.head_turn = 0.0
+        self.votes = []       # Recent recognition results while unidentified: (label, reg_no, distance) or None
+
+    def identify(self, label, reg_no):
+        self.label = label
+        self.reg_no = reg_no
+        self.votes = []
+
+    def vote(self, label, reg_no, distance, window=5, needed=3):
+        """
+        Records one frame's recognition (label None = no accepted match). Commits to the
+        label with the most accepted results among the last `window` once it has `needed`
+        of them (ties go to the lower mean distance). Returns True if the track was identified.
+        """
+        self.votes.append((label, reg_no, distance) if label is not None else None)
+        del self.votes[:-window]
+        accepted = [v for v in self.votes if v is not None]
+        if not accepted:
+            return False
+        counts = Counter((label, reg_no) for label, reg_no, _ in accepted)
+        def mean_distance(key):
+            return sum(d for l, r, d in accepted if (l, r) == key) / counts[key]
+        best = min(counts, key=lambda key: (-counts[key], mean_distance(key)))
+        if counts[best] < needed:
+            return False
+        self.identify(*best)
+        return True
+
+class FaceTracker(object):
+    def __init__(self, iou_threshold=0.3, min_confidence=0.5):
+        self.iou_threshold = iou_threshold
+        self.min_confidence = min_confidence
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def needs_detection(self):
+        """True when some track has lost its face and the detector should run."""
+        return any(track.confidence < self.min_confidence for track in self.tracks)
+
+    def update(self, gray, boxes):
+        """Detection frame: match boxes to tracks by IoU. Unmatched tracks are dropped."""
+        pairs = sorted(
+            ((iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)),
+            reverse=True
+        )
+        matched_tracks, matched_boxes = {}, set()
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or b in matched_boxes:
+                continue
+            matched_tracks[t] = b
+            matched_boxes.add(b)
+
+        tracks = []
+        for t, b in matched_tracks.items():
+            track = self.tracks[t]
+            track.box = tuple(int(v) for v in boxes[b])
+            tracks.append(track)
+        for b, box in enumerate(boxes):
+            if b not in matched_boxes:
+                tracks.append(Track(next(self._ids), box))
+
+        for track in tracks:
+            track.confidence = 1.0
+            track.fresh = True
+            track.template = self._template(gray, track.box)
+        self.tracks = tracks
+        return self.tracks
+
+    def advance(self, gray):
+        """Between detections: move each track to its best template match nearby."""
+        for track in self.tracks:
+            track.fresh = False
+            if track.template is None:
+                track.confidence = 0.0
+                continue
+            track.box, track.confidence = self._follow(gray, track)
+        return self.tracks
+
+    def reset(self):
+        self.tracks = []
+
+    def _template(self, gray, box):
+        x, y, w, h = box
+        patch = gray[max(0, y):y + h, max(0, x):x + w]
+        if patch.size == 0:
+            return None
+        scale = TEMPLATE_WIDTH / float(w)
+        return cv2.resize(patch, (TEMPLATE_WIDTH, max(1, int(round(h * scale)))), interpolation=cv2.INTER_AREA)
+
+    def _follow(self, gray, track):
+        x, y, w, h = track.box
+        frame_h, frame_w = gray.shape[:2]
+        mx, my = int(w * SEARCH_MARGIN), int(h * SEARCH_MARGIN)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+
+        scale = TEMPLATE_WIDTH / float(w)
+        window = gray[y0:y1, x0:x1]
+        window_w, window_h = int(round((x1 - x0) * scale)), int(round((y1 - y0) * scale))
+        templ_h, templ_w = track.template.shape[:2]
+        if window_w < templ_w or window_h < templ_h:
+            return track.box, 0.0 # Face ran off the edge of the frame
+
+        window = cv2.resize(window, (window_w, window_h), interpolation=cv2.INTER_AREA)
+        scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+        new_box = (int(x0 + bx / scale), int(y0 + by / scale), w, h)
+        return new_box, float(np.clip(best, 0.0, 1.0))
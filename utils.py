@@ -1,6 +1,9 @@
 import mysql.connector
+from mysql.connector import pooling
 from datetime import datetime, date
 import os
+import threading
+import time
 
 # --- Database Configuration ---
 # CHANGE THESE IF YOUR MYSQL CONFIGURATION IS DIFFERENT
@@ -11,83 +14,115 @@ DB_CONFIG = {
     'database': 'smart_attendance_db'
 }
 
-def get_db_connection():
-    """Establishes and returns a database connection."""
+# --- Connection Pool Configuration ---
+# All helpers below share one pool per process instead of opening a fresh
+# connection (plus a bootstrap connection) on every call.
+DB_POOL_CONFIG = {
+    'pool_name': 'smart_attendance_pool',
+    'pool_size': 5,             # Max open connections per process (mysql-connector allows up to 32)
+    'checkout_timeout': 5.0,    # Seconds to wait for a free connection before giving up
+    'retry_interval': 0.05,     # Seconds between checkout attempts while the pool is exhausted
+    'health_check': True        # Ping (and reconnect) a connection before handing it out
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _ensure_database():
+    """Create the database if needed. Runs once per process, before the pool is built."""
+    conn = mysql.connector.connect(
+        host=DB_CONFIG['host'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password']
+    )
     try:
-        # First connect without database to ensure it exists
-        conn = mysql.connector.connect(
-            host=DB_CONFIG['host'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password']
-        )
         cursor = conn.cursor()
         cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
+        cursor.close()
+    finally:
         conn.close()
 
-        # Now connect to the specific database
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
+def _get_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _ensure_database()
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=DB_POOL_CONFIG['pool_name'],
+                    pool_size=DB_POOL_CONFIG['pool_size'],
+                    pool_reset_session=True,
+                    **DB_CONFIG
+                )
+    return _pool
+
+def get_db_connection():
+    """
+    Checks out a connection from the shared pool.
+    Calling close() on the returned connection hands it back to the pool.
+    Returns None if the database is unreachable or no connection frees up
+    within DB_POOL_CONFIG['checkout_timeout'].
+    """
+    try:
+        pool = _get_pool()
     except mysql.connector.Error as err:
         print(f"Error connecting to database: {err}")
         return None
 
+    deadline = time.monotonic() + DB_POOL_CONFIG['checkout_timeout']
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except pooling.PoolError:
+            # Pool exhausted - wait for another thread to return a connection
+            if time.monotonic() >= deadline:
+                print("Error connecting to database: connection pool exhausted (checkout timeout)")
+                return None
+            time.sleep(DB_POOL_CONFIG['retry_interval'])
+        except mysql.connector.Error as err:
+            print(f"Error connecting to database: {err}")
+            return None
+
+    if DB_POOL_CONFIG['health_check']:
+        try:
+            # Revives connections dropped by the server (e.g. wait_timeout)
+            conn.ping(reconnect=True, attempts=1, delay=0)
+        except mysql.connector.Error as err:
+            print(f"Error connecting to database: stale pooled connection ({err})")
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+            return None
+
+    return conn
+
+_schema_ready = False
+
 def init_db():
-    """Initialize the MySQL database and create tables if they don't exist."""
-    conn = get_db_connection()
-    if conn is None:
-        print("Failed to initialize database. Check your connection settings.")
+    """
+    Bring the database schema up to date. Runs the versioned migrations in
+    migrations.py once per process; request-path helpers never run DDL.
+    Call this at startup (app.py does) or run `python migrations.py`.
+    """
+    global _schema_ready
+    if _schema_ready:
         return
 
-    cursor = conn.cursor()
+    # Imported here because migrations.py itself imports get_db_connection
+    from migrations import migrate
 
-    # Create Students Table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS students (
-        RegisterNo VARCHAR(50) PRIMARY KEY,
-        Name VARCHAR(100),
-        Dept VARCHAR(50),
-        Year VARCHAR(20),
-        Email VARCHAR(100),
-        Contact VARCHAR(20),
-        PhotoPath VARCHAR(255),
-        EncodingPath VARCHAR(255)
-    )
-    """)
-
-    # Create Staff Table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS staff (
-        Email VARCHAR(100) PRIMARY KEY,
-        Name VARCHAR(100),
-        Dept VARCHAR(50),
-        Contact VARCHAR(20),
-        Password VARCHAR(255)
-    )
-    """)
-
-    # Create Attendance Table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS attendance (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        RegisterNo VARCHAR(50),
-        Name VARCHAR(100),
-        Date DATE,
-        Morning_IN TIME,
-        Evening_OUT TIME,
-        Dept VARCHAR(50),
-        Year VARCHAR(20),
-        Status VARCHAR(20),
-        FOREIGN KEY (RegisterNo) REFERENCES students(RegisterNo)
-    )
-    """)
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    version = migrate()
+    if version is None:
+        print("Failed to initialize database. Check your connection settings.")
+        return
+
+    _schema_ready = True
     print("Database initialized and tables checked.")
 
 def get_all_students():
-    init_db()
     conn = get_db_connection()
     if not conn: return []
     
@@ -101,6 +136,21 @@ def get_all_students():
     finally:
         conn.close()
 
+def get_students_by_class(dept, year):
+    """Students of one Dept/Year class."""
+    conn = get_db_connection()
+    if not conn: return []
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT * FROM students WHERE Dept = %s AND Year = %s", (dept, year))
+        return cursor.fetchall()
+    except Exception as e:
+        print(f"Error reading students: {e}")
+        return []
+    finally:
+        conn.close()
+
 def get_student_by_reg(reg_no):
     conn = get_db_connection()
     if not conn: return None
@@ -115,8 +165,72 @@ def get_student_by_reg(reg_no):
     finally:
         conn.close()
 
+class StudentDirectory(object):
+    """
+    In-memory cache of student profiles (RegisterNo, Name, Dept, Year) for the
+    recognition hot path. Bulk-loaded when the recognizer is trained, keyed by
+    both RegisterNo and recognizer label id; misses fall back to MySQL.
+    """
+    FIELDS = ('RegisterNo', 'Name', 'Dept', 'Year')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_reg = {}
+        self._by_label = {}
+
+    def _profile(self, student):
+        profile = {field: student.get(field) for field in self.FIELDS}
+        profile['RegisterNo'] = str(profile['RegisterNo'])
+        return profile
+
+    def load(self, students, label_map):
+        """Replaces the cache. label_map is label id -> RegisterNo (camera.known_face_names)."""
+        by_reg = {}
+        for student in students:
+            profile = self._profile(student)
+            by_reg[profile['RegisterNo']] = profile
+        by_label = {label: by_reg[reg_no] for label, reg_no in label_map.items() if reg_no in by_reg}
+        with self._lock:
+            self._by_reg = by_reg
+            self._by_label = by_label
+
+    def set_label(self, label, student):
+        """Adds or refreshes one student under its recognizer label."""
+        profile = self._profile(student)
+        with self._lock:
+            self._by_reg[profile['RegisterNo']] = profile
+            self._by_label[label] = profile
+
+    def by_label(self, label):
+        return self._by_label.get(label)
+
+    def get(self, reg_no):
+        reg_no = str(reg_no)
+        profile = self._by_reg.get(reg_no)
+        if profile is None:
+            student = get_student_by_reg(reg_no)
+            if student is None:
+                return None
+            profile = self._profile(student)
+            with self._lock:
+                self._by_reg[reg_no] = profile
+        return profile
+
+    def invalidate(self, reg_no=None):
+        """Drops one student (or everyone when reg_no is None) so the next lookup re-reads MySQL."""
+        with self._lock:
+            if reg_no is None:
+                self._by_reg = {}
+                self._by_label = {}
+                return
+            reg_no = str(reg_no)
+            self._by_reg.pop(reg_no, None)
+            self._by_label = {label: p for label, p in self._by_label.items() if p['RegisterNo'] != reg_no}
+
+# Shared by the camera pipeline; add_student and camera.load_known_faces keep it current
+student_directory = StudentDirectory()
+
 def get_staff_by_email(email):
-    init_db()
     conn = get_db_connection()
     if not conn: return None
     
@@ -131,7 +245,6 @@ def get_staff_by_email(email):
         conn.close()
 
 def add_student(data):
-    init_db()
     conn = get_db_connection()
     if not conn: return False
     
@@ -143,6 +256,7 @@ def add_student(data):
                data['Contact'], data['PhotoPath'], data['EncodingPath'])
         cursor.execute(sql, val)
         conn.commit()
+        student_directory.invalidate(data['RegisterNo'])
         return True
     except mysql.connector.Error as err:
         print(f"Error adding student: {err}")
@@ -151,7 +265,6 @@ def add_student(data):
         conn.close()
 
 def add_staff(data):
-    init_db()
     conn = get_db_connection()
     if not conn: return False
     
@@ -174,50 +287,120 @@ def add_staff(data):
     finally:
         conn.close()
 
+# Transitions reported by mark_attendance's upsert
+ATTENDANCE_MORNING_IN = 'morning_in'
+ATTENDANCE_EVENING_OUT = 'evening_out'
+ATTENDANCE_COMPLETE = 'complete'
+
+# Relies on the (RegisterNo, Date) unique key from migration 2: the first mark
+# of the day inserts the Morning IN row, the next one fills Evening OUT once.
+UPSERT_ATTENDANCE_SQL = """INSERT INTO attendance (RegisterNo, Name, Date, Morning_IN, Dept, Year, Status)
+         VALUES (%s, %s, %s, %s, %s, %s, 'Present')
+         ON DUPLICATE KEY UPDATE Evening_OUT = IF(Evening_OUT IS NULL, %s, Evening_OUT)"""
+
+def upsert_attendance(cursor, reg_no, name, dept, year, today, now):
+    """
+    Marks attendance with a single atomic statement and returns the transition.
+    The caller owns the connection and must commit.
+    """
+    cursor.execute(UPSERT_ATTENDANCE_SQL, (reg_no, name, today, now, dept, year, now))
+    # Affected rows for INSERT ... ON DUPLICATE KEY UPDATE (connector default, no FOUND_ROWS flag):
+    # 1 = new row inserted, 2 = existing row updated, 0 = existing row left unchanged
+    if cursor.rowcount == 1:
+        return ATTENDANCE_MORNING_IN
+    if cursor.rowcount == 2:
+        return ATTENDANCE_EVENING_OUT
+    return ATTENDANCE_COMPLETE
+
+def attendance_message(transition, name, now):
+    """Human readable status for an attendance transition."""
+    if transition == ATTENDANCE_MORNING_IN:
+        return f"Morning Attendance Marked for {name} at {now}"
+    if transition == ATTENDANCE_EVENING_OUT:
+        return f"Evening Attendance Marked for {name} at {now}"
+    return f"Attendance already complete for {name} today."
+
 def mark_attendance(reg_no, name, dept, year):
-    init_db()
     conn = get_db_connection()
     if not conn: return "Database Error"
     
     today = date.today().strftime('%Y-%m-%d')
     now = datetime.now().strftime('%H:%M:%S')
     
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
     
     try:
-        # Check if record exists for today
-        cursor.execute("SELECT * FROM attendance WHERE RegisterNo = %s AND Date = %s", (reg_no, today))
-        record = cursor.fetchone()
-        
-        msg = ""
-        if not record:
-            # New entry for today (Morning IN)
-            sql = """INSERT INTO attendance (RegisterNo, Name, Date, Morning_IN, Dept, Year, Status)
-                     VALUES (%s, %s, %s, %s, %s, %s, 'Present')"""
-            val = (reg_no, name, today, now, dept, year)
-            cursor.execute(sql, val)
-            conn.commit()
-            msg = f"Morning Attendance Marked for {name} at {now}"
-        else:
-            # Update Evening OUT
-            if record['Evening_OUT']:
-                 msg = f"Attendance already complete for {name} today."
-            else:
-                # Update Evening OUT
-                sql = "UPDATE attendance SET Evening_OUT = %s WHERE id = %s"
-                cursor.execute(sql, (now, record['id']))
-                conn.commit()
-                msg = f"Evening Attendance Marked for {name} at {now}"
-                
-        return msg
+        # Morning IN / Evening OUT in one round trip; safe when two cameras mark at once
+        transition = upsert_attendance(cursor, reg_no, name, dept, year, today, now)
+        conn.commit()
+        return attendance_message(transition, name, now)
     except mysql.connector.Error as err:
         print(f"Error marking attendance: {err}")
         return f"Error: {err}"
     finally:
         conn.close()
 
+def mark_attendance_batch(events):
+    """
+    Writes a batch of attendance events on one connection and one commit.
+    Each event is a dict with RegisterNo, Name, Dept, Year, Date ('YYYY-MM-DD') and Time ('HH:MM:SS').
+    Returns a list of (transition, message) in event order, or None if the database could
+    not be reached (nothing is committed in that case, so the caller can safely retry it).
+    If one event is rejected (foreign key, value too long, ...) the batch is rolled back and
+    written again one event at a time; the rejected events get a None transition.
+    """
+    conn = get_db_connection()
+    if not conn: return None
+
+    cursor = conn.cursor()
+    try:
+        results = []
+        for event in events:
+            results.append(_upsert_event(cursor, event))
+        conn.commit()
+        return results
+    except (mysql.connector.InterfaceError, mysql.connector.OperationalError) as err:
+        print(f"Error writing attendance batch: {err}")
+        _rollback(conn)
+        return None
+    except mysql.connector.Error as err:
+        print(f"Attendance batch rejected, writing events one by one: {err}")
+        _rollback(conn)
+        return _mark_events_singly(conn, cursor, events)
+    finally:
+        conn.close()
+
+def _upsert_event(cursor, event):
+    transition = upsert_attendance(cursor, event['RegisterNo'], event['Name'], event['Dept'],
+                                   event['Year'], event['Date'], event['Time'])
+    return transition, attendance_message(transition, event['Name'], event['Time'])
+
+def _mark_events_singly(conn, cursor, events):
+    """One commit per event, so a bad event only fails itself. Failed events get (None, error)."""
+    results = []
+    for event in events:
+        try:
+            result = _upsert_event(cursor, event)
+            conn.commit()
+            results.append(result)
+        except (mysql.connector.InterfaceError, mysql.connector.OperationalError) as err:
+            # Connection gone: earlier events are committed, so fail the rest rather than retry them
+            print(f"Error writing attendance: {err}")
+            results.extend((None, "Database Error") for _ in events[len(results):])
+            break
+        except mysql.connector.Error as err:
+            print(f"Error marking attendance for {event['RegisterNo']}: {err}")
+            _rollback(conn)
+            results.append((None, f"Error: {err}"))
+    return results
+
+def _rollback(conn):
+    try:
+        conn.rollback()
+    except mysql.connector.Error:
+        pass
+
 def get_attendance_stats(user_type, identifier=None):
-    init_db()
     conn = get_db_connection()
     if not conn: return []
     
@@ -239,6 +422,83 @@ def get_attendance_stats(user_type, identifier=None):
         conn.close()
 
 
+def get_attendance_summary(dept=None, year=None):
+    """
+    Per-student attendance summary for the staff dashboard, computed in a
+    single grouped query instead of one query per student.
+    Optional dept/year filters restrict the student list.
+    Returns a list of dicts with Name, RegisterNo, Dept, Year, Total, Present, OD, Absent, Percentage.
+    """
+    conn = get_db_connection()
+    if not conn: return []
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # Total working days = every distinct date attendance was taken (same rule as get_distinct_dates)
+        sql = """SELECT s.RegisterNo, s.Name, s.Dept, s.Year,
+                        COUNT(DISTINCT CASE WHEN a.Status = 'Present' THEN a.Date END) AS Present,
+                        COUNT(DISTINCT CASE WHEN a.Status = 'OD' THEN a.Date END) AS OD,
+                        (SELECT COUNT(DISTINCT Date) FROM attendance) AS Total
+                 FROM students s
+                 LEFT JOIN attendance a ON a.RegisterNo = s.RegisterNo"""
+        conditions = []
+        params = []
+        if dept:
+            conditions.append("s.Dept = %s")
+            params.append(dept)
+        if year:
+            conditions.append("s.Year = %s")
+            params.append(year)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " GROUP BY s.RegisterNo, s.Name, s.Dept, s.Year ORDER BY s.RegisterNo"
+
+        cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall()
+    except Exception as e:
+        print(f"Error getting attendance summary: {e}")
+        return []
+    finally:
+        conn.close()
+
+    summary = []
+    for row in rows:
+        total = int(row['Total'] or 0)
+        present = int(row['Present'] or 0)
+        od = int(row['OD'] or 0)
+        percentage = ((present + od) / total * 100) if total > 0 else 0
+        summary.append({
+            'Name': row['Name'],
+            'RegisterNo': row['RegisterNo'],
+            'Dept': row['Dept'],
+            'Year': row['Year'],
+            'Total': total,
+            'Present': present,
+            'OD': od,
+            'Absent': total - (present + od),
+            'Percentage': round(percentage, 2)
+        })
+    return summary
+
+def get_student_filter_options():
+    """Returns the distinct departments and years for the staff dashboard filters."""
+    conn = get_db_connection()
+    if not conn: return {'depts': [], 'years': []}
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT Dept, Year FROM students")
+        rows = cursor.fetchall()
+        return {
+            'depts': sorted({row[0] for row in rows if row[0]}),
+            'years': sorted({row[1] for row in rows if row[1]})
+        }
+    except Exception as e:
+        print(f"Error fetching filter options: {e}")
+        return {'depts': [], 'years': []}
+    finally:
+        conn.close()
+
 def get_student_by_identifier(identifier):
     """
     Search student by RegisterNo OR Email.
@@ -400,7 +660,6 @@ def get_available_months():
     Format: [{'value': 'YYYY-MM', 'label': 'MonthName YYYY'}, ...]
     Includes distinct months from DB + All months of current year.
     """
-    init_db()
     conn = get_db_connection()
     if not conn: return []
     
@@ -441,7 +700,6 @@ def get_available_months():
 
 def get_distinct_dates():
     """Returns a list of all unique dates where attendance was taken."""
-    init_db()
     conn = get_db_connection()
     if not conn: return []
     
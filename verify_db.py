@@ -18,7 +18,7 @@ def verify_setup():
         missing = [t for t in required_tables if t not in tables]
         
         if missing:
-            print(f"[WARNING] Missing tables: {missing}. Run the app or utils.init_db() to create them.")
+            print(f"[WARNING] Missing tables: {missing}. Run the app or `python migrations.py` to create them.")
         else:
             print("[SUCCESS] All required tables exist.")
             
@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+
+from sample_store import SampleStore, migrate
+
+def verify():
+    print("--- Verifying Sample Store Deletes ---")
+    root = tempfile.mkdtemp()
+    try:
+        encoding_dir = os.path.join(root, 'encodings')
+        os.makedirs(os.path.join(encoding_dir, 'R1'))
+        for i in range(3):
+            cv2.imwrite(os.path.join(encoding_dir, 'R1', f'{i}.jpg'), np.full((200, 200), i * 50, np.uint8))
+        store = SampleStore(os.path.join(root, 'samples'))
+
+        print(f"First migrate (imported, skipped, unreadable): {migrate(store, encoding_dir)}")
+        store.delete(ids=[1])
+        after_delete = migrate(store, encoding_dir)
+        print(f"Migrate after delete: {after_delete}")
+        print(f"Compact (kept, dropped): {store.compact()}")
+        after_compact = migrate(store, encoding_dir)
+        print(f"Migrate after compact: {after_compact}")
+
+        ok = after_delete[0] == 0 and after_compact[0] == 0 and len(store.records()) == 2
+        print("PASS: deleted samples stay deleted." if ok else "FAIL: a deleted sample was imported again.")
+        return ok
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    verify()